@@ -0,0 +1,64 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each case runs in a fresh interpreter so module imports are measured cold.
+CASES = {
+    "main.py --help": [sys.executable, "main.py", "--help"],
+    "web.app boot": [sys.executable, "-c", "import web.app"],
+    "web.fast boot": [sys.executable, "-c", "import web.fast"],
+    "eval.split import": [sys.executable, "-c", "import eval.split"],
+    "first local lookup": [
+        sys.executable,
+        "-c",
+        "from src.pump_dictionary import get_from_db; get_from_db('Grundfos', 'UPS 15-58')",
+    ],
+}
+
+
+def _time_once(cmd: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def bench(runs: int = 5) -> dict:
+    results = {}
+    for name, cmd in CASES.items():
+        _time_once(cmd)  # warm the OS file cache and __pycache__
+        times = [_time_once(cmd) for _ in range(runs)]
+        results[name] = {"median_ms": statistics.median(times) * 1000, "min_ms": min(times) * 1000}
+    return results
+
+
+def heaviest_imports(cmd: list[str], top: int = 10) -> list[tuple[int, str]]:
+    """Largest cumulative import times (microseconds) reported by `python -X importtime`."""
+    proc = subprocess.run(
+        [cmd[0], "-X", "importtime", *cmd[1:]], cwd=ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark CLI and app start-up latency")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--imports", action="store_true", help="Also list the slowest imports per case")
+    args = parser.parse_args()
+
+    print("=== STARTUP BENCHMARK ===")
+    for name, r in bench(args.runs).items():
+        print(f"{name:<22} median={r['median_ms']:7.1f}ms  min={r['min_ms']:7.1f}ms")
+        if args.imports:
+            for us, module in heaviest_imports(CASES[name]):
+                print(f"    {us / 1000:7.1f}ms  {module}")
@@ -3,10 +3,12 @@ import time
 import pandas as pd
 from eval.split import load_dataset, split_dataset
 from eval.metrics import accuracy, mae, mape, coverage
-from src.agent import lookup_pump
+from src.agent import lookup_pump, lookup_pumps_batch, cascade_stats
+from src.perplexity import perplexity_usage
+from src.resilience import resilience_stats
 
 
-def evaluate(n_samples: int | None = None):
+def evaluate(n_samples: int | None = None, batch_size: int | None = None):
     df = load_dataset()
     _, val = split_dataset(df)
 
@@ -18,18 +20,23 @@ def evaluate(n_samples: int | None = None):
     predictions = []
     start = time.time()
 
-    for i, row in val.iterrows():
-        mfr = row["MANUFACTURER"]
-        prod = row["PRODNAME"]
-        print(f"  [{i+1}/{len(val)}] {mfr} / {prod}...", end=" ", flush=True)
-        try:
-            result = lookup_pump(mfr, prod)
-        except Exception as e:
-            result = {"FLOWNOM56": "unknown", "HEADNOM56": "unknown", "PHASE": "unknown"}
-            print(f"ERROR: {e}")
-            continue
-        predictions.append(result)
-        print(f"-> F={result['FLOWNOM56']} H={result['HEADNOM56']} P={result['PHASE']}")
+    if batch_size:
+        pumps = list(zip(val["MANUFACTURER"], val["PRODNAME"]))
+        print(f"  Batched lookups, up to {batch_size} pumps per request...")
+        predictions = lookup_pumps_batch(pumps, batch_size=batch_size)
+    else:
+        for i, row in val.iterrows():
+            mfr = row["MANUFACTURER"]
+            prod = row["PRODNAME"]
+            print(f"  [{i+1}/{len(val)}] {mfr} / {prod}...", end=" ", flush=True)
+            try:
+                result = lookup_pump(mfr, prod)
+            except Exception as e:
+                result = {"FLOWNOM56": "unknown", "HEADNOM56": "unknown", "PHASE": "unknown"}
+                print(f"ERROR: {e}")
+                continue
+            predictions.append(result)
+            print(f"-> F={result['FLOWNOM56']} H={result['HEADNOM56']} P={result['PHASE']}")
 
     elapsed = time.time() - start
 
@@ -48,11 +55,35 @@ def evaluate(n_samples: int | None = None):
     print(f"HEADNOM56:  MAE={mae(true_head, pred_head):.3f}  MAPE={mape(true_head, pred_head):.1f}%  Coverage={coverage(pred_head)*100:.1f}%")
     print(f"PHASE:      Accuracy={accuracy(true_phase, pred_phase)*100:.1f}%  Coverage={coverage(pred_phase)*100:.1f}%")
 
+    usage = perplexity_usage()
+    tokens = usage["prompt_tokens"] + usage["completion_tokens"]
+    print(
+        f"\nPerplexity: {usage['requests']} requests, {tokens} tokens ({tokens/max(len(predictions),1):.0f} tokens/pump), "
+        f"~${usage['cost_usd']:.4f}"
+    )
+    cascade = cascade_stats()
+    if cascade["lookups"]:
+        print(f"Cascade {' -> '.join(cascade['models'])}: ~${cascade['mean_cost_usd']:.5f}/lookup")
+        for model, tier in cascade["tiers"].items():
+            print(
+                f"  {model}: {tier['lookups']} lookups, escalated {tier['escalation_rate']*100:.1f}% {tier['reasons']}, "
+                f"{tier['requests']} requests, mean latency {tier['mean_latency_s']}s, ~${tier['cost_usd']:.4f}"
+            )
+    failed = sum(1 for p in predictions if "_error" in p)
+    if failed:
+        print(f"Failed lookups (errors, not misses): {failed}")
+    for name, stats in resilience_stats().items():
+        print(
+            f"{name}: {stats['calls']} calls, {stats['retries']} retries, {stats['failures']} failures, "
+            f"{stats['rejected']} rejected (circuit {stats['circuit']}), {stats['throttled_s']}s throttled"
+        )
+
 
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser()
     parser.add_argument("-n", type=int, default=None, help="Limit number of samples")
+    parser.add_argument("--batch", type=int, default=None, help="Pumps per Perplexity request (batched mode)")
     args = parser.parse_args()
-    evaluate(args.n)
+    evaluate(args.n, args.batch)
@@ -1,10 +1,14 @@
-import pandas as pd
 import datetime
-from sklearn.model_selection import train_test_split
+from typing import TYPE_CHECKING
 from src.config import DATASET_PATH
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def load_dataset() -> "pd.DataFrame":
+    import pandas as pd
 
-def load_dataset() -> pd.DataFrame:
     df = pd.read_excel(DATASET_PATH)
     df["PHASE"] = df["PHASE"].apply(_fix_phase)
     return df
@@ -19,7 +23,9 @@ def _fix_phase(val):
         return val
 
 
-def split_dataset(df: pd.DataFrame, test_size: float = 0.2, seed: int = 42):
+def split_dataset(df: "pd.DataFrame", test_size: float = 0.2, seed: int = 42):
+    from sklearn.model_selection import train_test_split
+
     train, val = train_test_split(
         df, test_size=test_size, random_state=seed, stratify=df["MANUFACTURER"]
     )
@@ -2,8 +2,6 @@ import argparse
 import json
 import sys
 
-from src.agent import lookup_pump
-
 
 def main():
     parser = argparse.ArgumentParser(description="Pump Researcher Agent")
@@ -12,6 +10,8 @@ def main():
     parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON output")
     args = parser.parse_args()
 
+    from src.agent import lookup_pump
+
     result = lookup_pump(args.manufacturer, args.prodname)
 
     output = {
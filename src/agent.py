@@ -1,15 +1,49 @@
-from src.perplexity import extract_via_perplexity, answer_pump_question
+from src.perplexity import (
+    extract_via_perplexity,
+    answer_pump_question,
+    aextract_via_perplexity,
+    aanswer_pump_question,
+    extract_batch_via_perplexity,
+    astream_pump_question,
+    perplexity_usage,
+    DATASET_MAX_FLOW,
+    DATASET_MAX_HEAD,
+)
 from src.normalizer import normalize_result
-from src.pump_dictionary import get_from_db
+from src.pump_dictionary import get_from_db, PumpDictionary, char_counts
+from src.cache import acache_get, acache_set, cache_get, cache_set
+from src.config import (
+    NEGATIVE_CACHE_TTL,
+    NEGATIVE_CACHE_MAX_TTL,
+    PERPLEXITY_CASCADE,
+    CASCADE_MIN_CONFIDENCE,
+    WEB_FRESHNESS_WINDOW,
+)
 import src.pump_dictionary as pump_dictionary
+import asyncio
 import math
-import sys
 import difflib
+import numpy as np
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 
 TARGET_KEYS = ["FLOWNOM56", "HEADNOM56", "PHASE"]
 
 MAX_DEVIATION = 0.50
 
+# Dropped when canonicalizing questions for the answer cache. Question words and negations
+# are kept on purpose: "why"/"what" and "is"/"is not" ask different things.
+# Modals and do/does stay in the key: "can I use it for X" and "should I use it for X"
+# are different questions.
+QUESTION_STOPWORDS = frozenset(
+    "a an the this that these those is are was were be been it its of to in on at by "
+    "for with please me my i you your tell about pump".split()
+)
+
 
 def _safe_float(value):
     try:
@@ -26,72 +60,57 @@ def _confidence_label(score: float) -> str:
     return "low"
 
 
-def _numeric_similarity(a, b) -> float:
-    """Return a similarity score in [0,1] for two numeric‑like values."""
-    af = _safe_float(a)
-    bf = _safe_float(b)
-    if af is None or bf is None:
-        return 1.0 if str(a).strip().lower() == str(b).strip().lower() else 0.0
-    if bf == 0:
-        return 1.0 if af == 0 else 0.0
-    pct_delta = abs(af - bf) / abs(bf)
-    if pct_delta >= 1.0:
-        return 0.0
-    return max(0.0, 1.0 - pct_delta)
+def _numeric_similarity(web_value, local: np.ndarray) -> np.ndarray:
+    """Similarity in [0,1] of one web value against a column of local values (NaN = unknown)."""
+    w = _safe_float(web_value)
+    if w is None:
+        return np.isnan(local).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sim = np.clip(1.0 - np.abs(w - local) / np.abs(local), 0.0, 1.0)
+    sim = np.where(local == 0, 1.0 if w == 0 else 0.0, sim)
+    return np.where(np.isnan(local), 0.0, sim)
 
 
-def _pump_similarity(web_result: dict, local_result: dict) -> float:
+def _pump_similarity(web_result: dict, columns: dict) -> np.ndarray:
     """
-    Compute a simple similarity score between web result and one local pump.
+    Compute a simple similarity score between web result and every local pump of a manufacturer.
     Used for retrieval quality metrics (not for production ranking).
     """
     weights = {"FLOWNOM56": 0.4, "HEADNOM56": 0.4, "PHASE": 0.2}
-    total = 0.0
-    weight_sum = 0.0
+    total = np.zeros(len(columns["records"]), dtype=np.float64)
 
     for key, w in weights.items():
         web_val = web_result.get(key, "unknown")
-        local_val = local_result.get(key, "unknown")
+        local = columns[key]
         if key in ("FLOWNOM56", "HEADNOM56"):
-            sim = _numeric_similarity(web_val, local_val)
+            sim = _numeric_similarity(web_val, local)
         else:
-            sim = 1.0 if str(web_val).strip().lower() == str(local_val).strip().lower() else 0.0
+            web_phase = _safe_float(web_val)
+            sim = np.isnan(local) if web_phase is None else (local == web_phase)
         total += sim * w
-        weight_sum += w
 
-    return total / weight_sum if weight_sum else 0.0
+    return total / sum(weights.values())
 
 
-def _name_similarity(query_prod: str, candidate_prod: str) -> float:
-    """
-    String similarity between the queried product name and a local product name.
-    Used as a secondary signal for ranking, especially when specs are missing.
-    """
-    q = str(query_prod or "").upper().strip()
-    c = str(candidate_prod or "").upper().strip()
-    if not q or not c:
-        return 0.0
-    return difflib.SequenceMatcher(None, q, c).ratio()
+def _name_similarity_bound(query: str, columns: dict) -> np.ndarray:
+    """Upper bound on difflib's ratio per candidate: 2 * shared characters / total length."""
+    if not query:
+        return np.zeros(len(columns["records"]), dtype=np.float64)
+    shared = np.minimum(columns["char_counts"], char_counts(query)).sum(axis=1)
+    return 2.0 * shared / (len(query) + columns["lengths"])
 
 
-def _top_k_local_candidates(manufacturer: str, k: int = 5) -> list[dict]:
-    """
-    Very simple retrieval over the local JSON 'DB':
-    filter by manufacturer and return all candidates.
-    Retrieval ranking is applied later.
-    """
-    manu_norm = str(manufacturer).strip().upper()
-    get_all = getattr(pump_dictionary, "get_all_pumps", None)
-    if get_all is None:
-        return []
-
-    candidates = []
-    for row in get_all():
-        if str(row.get("MANUFACTURER", "")).strip().upper() != manu_norm:
-            continue
-        candidates.append(row)
+def _top_k_indices(scores: np.ndarray, k: int | None) -> np.ndarray:
+    """Indices of the k best scores, best first; ties keep catalogue order (like a stable sort)."""
+    n = len(scores)
+    if k is None or k <= 0 or k >= n:
+        return np.argsort(-scores, kind="stable")
+    threshold = np.partition(scores, n - k)[n - k]
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)[: k - len(above)]
+    chosen = np.concatenate([above, ties])
+    return chosen[np.argsort(-scores[chosen], kind="stable")]
 
-    return candidates
 
 def _build_hybrid_comparison(web_result: dict, local_result: dict | None) -> dict:
     """Build trust/confidence metadata for web results using local DB as anchor."""
@@ -197,26 +216,75 @@ def evaluate_retrieval_metric(manufacturer: str, prodname: str, k: int = 5) -> d
     - compute similarity scores and derive a confidence / accuracy percentage
     """
     web_result = lookup_pump(manufacturer, prodname, force_web=True)
-    local_candidates = _top_k_local_candidates(manufacturer, k=k)
-
-    scored_candidates: list[dict] = []
+    columns = pump_dictionary.get_manufacturer_columns(manufacturer)
 
     # Detect if web specs are mostly missing; then lean more on name similarity
     web_flow_unknown = web_result.get("FLOWNOM56", "unknown") in (None, "", "unknown")
     web_head_unknown = web_result.get("HEADNOM56", "unknown") in (None, "", "unknown")
 
-    best_score = 0.0
+    # Name similarity from the trigram index: exact for a shortlist, trigram overlap for the rest
+    name_scores = np.zeros(len(columns["records"]), dtype=np.float64)
+    for name, score in pump_dictionary.get_name_scores(manufacturer, prodname).items():
+        name_scores[columns["positions"].get(name, [])] = score
+
+    spec_scores = _pump_similarity(web_result, columns)
+    spec_weight, name_weight = (0.3, 0.7) if (web_flow_unknown and web_head_unknown) else (0.7, 0.3)
+    final_scores = spec_weight * spec_scores + name_weight * name_scores
+
+    # Trigram overlap is only an estimate of the difflib ratio. Bound the ratio from above by
+    # shared character counts and score exactly every candidate that could still reach the top k.
+    query = str(prodname or "").upper().strip()
+    n = len(columns["records"])
+    exact = np.zeros(n, dtype=bool)
+    name_bound = _name_similarity_bound(query, columns)
+    needed = n if (k is None or k <= 0) else min(k, n)
+
+    def _score_exactly(indices):
+        for i in indices:
+            name_scores[i] = difflib.SequenceMatcher(None, query, columns["names"][i]).ratio() if query else 0.0
+            exact[i] = True
+
+    def _bound_scores():
+        return spec_weight * spec_scores + name_weight * np.where(exact, name_scores, name_bound)
+
+    while needed:
+        pending = [i for i in _top_k_indices(np.round(_bound_scores(), 3), needed) if not exact[i]]
+        if not pending:
+            break
+        _score_exactly(pending)
+
+    # Ground-truth: exact manufacturer+prodname exists in local JSON.
+    true_local = get_from_db(manufacturer, prodname)
+    matches = None
+    if true_local:
+        matches = columns["positions"].get(str(true_local.get("PRODNAME", "")).strip().upper())
+    if matches:
+        # Its rank must not rest on estimates: score it exactly, then every row that could still tie or beat it.
+        _score_exactly(i for i in matches if not exact[i])
+        bound_scores = np.round(_bound_scores(), 3)
+        true_score = bound_scores[matches].max()
+        _score_exactly(np.flatnonzero(~exact & (bound_scores >= true_score)))
 
-    for cand in local_candidates:
-        spec_score = _pump_similarity(web_result, cand)
-        name_score = _name_similarity(prodname, cand.get("PRODNAME", ""))
+    name_scores = np.where(exact, name_scores, np.minimum(name_scores, name_bound))
+    final_scores = spec_weight * spec_scores + name_weight * name_scores
 
-        if web_flow_unknown and web_head_unknown:
-            final_score = 0.3 * spec_score + 0.7 * name_score
-        else:
-            final_score = 0.7 * spec_score + 0.3 * name_score
+    best_score = float(final_scores.max()) if len(final_scores) else 0.0
+    # Rank by final similarity (as displayed, to 3 decimals) so that #1 is the most similar
+    ranked_scores = np.round(final_scores, 3)
 
-        best_score = max(best_score, final_score)
+    rank_of_true_local = None
+    if matches:
+        ranks = [
+            int(np.count_nonzero(ranked_scores > ranked_scores[i]))
+            + int(np.count_nonzero(ranked_scores[:i] == ranked_scores[i]))
+            for i in matches
+        ]
+        rank_of_true_local = min(ranks)
+
+    # Keep only top-k rows for display/validation.
+    scored_candidates: list[dict] = []
+    for i in _top_k_indices(ranked_scores, k):
+        cand = columns["records"][i]
         scored_candidates.append(
             {
                 "MANUFACTURER": cand.get("MANUFACTURER"),
@@ -224,35 +292,12 @@ def evaluate_retrieval_metric(manufacturer: str, prodname: str, k: int = 5) -> d
                 "FLOWNOM56": cand.get("FLOWNOM56"),
                 "HEADNOM56": cand.get("HEADNOM56"),
                 "PHASE": cand.get("PHASE"),
-                "similarity": round(final_score, 3),
-                "spec_similarity": round(spec_score, 3),
-                "name_similarity": round(name_score, 3),
+                "similarity": float(ranked_scores[i]),
+                "spec_similarity": round(float(spec_scores[i]), 3),
+                "name_similarity": round(float(name_scores[i]), 3),
             }
         )
 
-    # Rank by final similarity so that #1 is the most similar
-    scored_candidates.sort(key=lambda c: c["similarity"], reverse=True)
-
-    # Ground-truth: exact manufacturer+prodname exists in local JSON.
-    true_local = get_from_db(manufacturer, prodname)
-    true_key = None
-    if true_local:
-        true_key = (
-            str(true_local.get("MANUFACTURER", "")).strip().upper(),
-            str(true_local.get("PRODNAME", "")).strip().upper(),
-        )
-
-    rank_of_true_local = None
-    if true_key:
-        for i, row in enumerate(scored_candidates):
-            cand_key = (
-                str(row.get("MANUFACTURER", "")).strip().upper(),
-                str(row.get("PRODNAME", "")).strip().upper(),
-            )
-            if cand_key == true_key:
-                rank_of_true_local = i
-                break
-
     hit_at_k = None
     mrr = None
     ndcg_at_k = None
@@ -273,10 +318,6 @@ def evaluate_retrieval_metric(manufacturer: str, prodname: str, k: int = 5) -> d
     # This is a validation threshold flag, not a real accuracy metric.
     passes_threshold = bool(best_score >= 0.8)
 
-    # Keep only top-k rows for display/validation.
-    if k is not None and k > 0:
-        scored_candidates = scored_candidates[:k]
-
     return {
         "manufacturer": manufacturer,
         "prodname": prodname,
@@ -293,17 +334,256 @@ def evaluate_retrieval_metric(manufacturer: str, prodname: str, k: int = 5) -> d
     }
 
 
-def lookup_pump(manufacturer: str, prodname: str, force_web: bool = False) -> dict:
+def _recent_miss(manufacturer: str, prodname: str) -> dict | None:
+    """Negative-cache entry if this pump came back all-unknown recently and is still backing off."""
+    miss = cache_get("negative", PumpDictionary._make_key(manufacturer, prodname))
+    if miss and miss.get("retry_at", 0) > time.time():
+        return miss
+    return None
+
+
+def _record_lookup_outcome(manufacturer: str, prodname: str, found: bool):
+    key = PumpDictionary._make_key(manufacturer, prodname)
+    previous = cache_get("negative", key)
+    if found:
+        if previous and previous.get("misses"):
+            cache_set("negative", {"misses": 0, "retry_at": 0}, key)
+        return
+    misses = (previous or {}).get("misses", 0) + 1
+    delay = min(NEGATIVE_CACHE_TTL * 2 ** (misses - 1), NEGATIVE_CACHE_MAX_TTL)
+    cache_set("negative", {"misses": misses, "retry_at": time.time() + delay}, key)
+
+
+def _lookup_without_web(manufacturer: str, prodname: str, force_web: bool) -> dict | None:
+    """Answer from the local DB or the negative cache, or None when a web lookup is needed."""
     if not force_web:
         cached_result = get_from_db(manufacturer, prodname)
         if cached_result:
-            return cached_result
+            return dict(cached_result)
+
+    miss = _recent_miss(manufacturer, prodname)
+    if miss:
+        result = {key: "unknown" for key in TARGET_KEYS}
+        local = get_from_db(manufacturer, prodname)
+        if local and local.get("PHASE") not in (None, "unknown"):
+            result["PHASE"] = local["PHASE"]
+        result["MANUFACTURER"] = manufacturer
+        result["PRODNAME"] = prodname
+        result["_source"] = "negative_cache"
+        result["_not_found_recently"] = True
+        result["_retry_after"] = round(miss["retry_at"] - time.time())
+        return result
+    return None
+
+
+def _unknown_fields(error: Exception) -> dict:
+    return {"FLOWNOM56": "unknown", "HEADNOM56": "unknown", "PHASE": "unknown", "_error": str(error)}
+
+
+def _record_fields(manufacturer: str, prodname: str, fields: dict) -> dict:
+    # Failed calls are not misses: only a completed lookup that found nothing backs off.
+    if "_error" not in fields:
+        result = normalize_result(fields)
+        found = any(result.get(key) != "unknown" for key in TARGET_KEYS)
+        _record_lookup_outcome(manufacturer, prodname, found)
+    return fields
+
+
+# Single-flight: concurrent web lookups of the same pump (sync or async callers alike)
+# share one Perplexity call. key -> concurrent.futures.Future of the extracted fields.
+_inflight = {}
+_inflight_lock = threading.Lock()
+_flight_stats = {"calls": 0, "coalesced": 0}
+# Async calls being shared, each run as its own task
+_flight_tasks = set()
+
+
+def _join_flight(key: str) -> tuple[Future, bool]:
+    """The in-flight future for `key`, and whether the caller leads it (must make the call)."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            _flight_stats["coalesced"] += 1
+            return future, False
+        future = _inflight[key] = Future()
+        _flight_stats["calls"] += 1
+        return future, True
+
+
+def _land_flight(key: str, future: Future, fields: dict | None = None, error: BaseException | None = None):
+    with _inflight_lock:
+        _inflight.pop(key, None)
+    if error is not None:
+        if not isinstance(error, Exception):
+            # e.g. the leading task was cancelled: followers get an ordinary error, not its cancellation
+            error = RuntimeError(f"shared lookup aborted ({type(error).__name__})")
+        future.set_exception(error)
+    else:
+        future.set_result(fields)
+
+
+def single_flight_stats() -> dict:
+    """Web lookups made vs. coalesced into another caller's in-flight lookup."""
+    with _inflight_lock:
+        calls, coalesced = _flight_stats["calls"], _flight_stats["coalesced"]
+        in_flight = len(_inflight)
+    total = calls + coalesced
+    return {
+        "calls": calls,
+        "coalesced": coalesced,
+        "in_flight": in_flight,
+        "coalesced_ratio": round(coalesced / total, 3) if total else 0.0,
+    }
+
+
+def _extract_fields(manufacturer: str, prodname: str) -> dict:
+    key = PumpDictionary._make_key(manufacturer, prodname)
+    future, leader = _join_flight(key)
+    if not leader:
+        try:
+            return future.result()
+        except Exception as e:
+            return _unknown_fields(e)
 
     try:
-        fields = extract_via_perplexity(manufacturer, prodname)
-    except Exception as e:
-        fields = {"FLOWNOM56": "unknown", "HEADNOM56": "unknown", "PHASE": "unknown", "_error": str(e)}
+        fields = _record_fields(manufacturer, prodname, _cascade_extract(manufacturer, prodname))
+    except BaseException as e:
+        _land_flight(key, future, error=e)
+        raise
+    _land_flight(key, future, fields)
+    return fields
+
+
+async def _aextract_fields(manufacturer: str, prodname: str) -> dict:
+    key = PumpDictionary._make_key(manufacturer, prodname)
+    future, leader = _join_flight(key)
+    if not leader:
+        try:
+            # shield: a cancelled follower must not cancel the shared call
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except Exception as e:
+            return _unknown_fields(e)
+
+    async def _shared_call() -> dict:
+        try:
+            fields = await _acascade_extract(manufacturer, prodname)
+            # Cache reads/writes (and an inline flush) stay off the event loop.
+            fields = await asyncio.to_thread(_record_fields, manufacturer, prodname, fields)
+        except BaseException as e:
+            _land_flight(key, future, error=e)
+            raise
+        _land_flight(key, future, fields)
+        return fields
+
+    # The call runs as its own task, so cancelling the leader does not abort it for the followers.
+    # The set holds the only strong reference, so the task is not collected mid-flight.
+    task = asyncio.get_running_loop().create_task(_shared_call())
+    _flight_tasks.add(task)
+    task.add_done_callback(_flight_tasks.discard)
+    return await asyncio.shield(task)
+
+
+# Model cascade: per extraction model, lookups it answered and how many it passed up (and why)
+_cascade = {}
+_cascade_lock = threading.Lock()
+
+
+def _escalation_reason(manufacturer: str, prodname: str, fields: dict) -> tuple[str | None, float]:
+    """Why a tier's result is too weak to keep (None if it will do), and its hybrid confidence."""
+    web = _web_result(manufacturer, prodname, fields)
+    local = get_from_db(manufacturer, prodname)
+    comparison = _build_hybrid_comparison(web, local)
+    confidence = comparison["overall_confidence"]
+    if "_error" in fields:
+        return "error", confidence
+    if any(web.get(key) == "unknown" for key in TARGET_KEYS):
+        return "unknown", confidence
+    if _safe_float(web["FLOWNOM56"]) > DATASET_MAX_FLOW or _safe_float(web["HEADNOM56"]) > DATASET_MAX_HEAD:
+        return "out_of_range", confidence
+    # Without a local entry the score only says "web-only", which is no reason to pay more.
+    if local and confidence < CASCADE_MIN_CONFIDENCE:
+        return "low_confidence", confidence
+    return None, confidence
+
+
+def _cascade_step(manufacturer: str, prodname: str, model: str, fields: dict, best, last: bool):
+    """
+    Record one tier's result. Returns the best (rank, fields) so far, preferring results
+    without errors, then higher confidence, then the stronger model, and whether to escalate.
+    A failed call (rate limit, outage) is recorded but not escalated: the next tier is the
+    same upstream at a higher price.
+    """
+    reason, confidence = _escalation_reason(manufacturer, prodname, fields)
+    escalate = reason not in (None, "error") and not last
+    with _cascade_lock:
+        tier = _cascade.setdefault(model, {"lookups": 0, "escalated": 0, "reasons": {}})
+        tier["lookups"] += 1
+        if reason is not None:
+            tier["reasons"][reason] = tier["reasons"].get(reason, 0) + 1
+        if escalate:
+            tier["escalated"] += 1
+    rank = ("_error" not in fields, confidence)
+    if best is None or rank >= best[0]:
+        best = (rank, {**fields, "_model": model})
+    return best, escalate
+
+
+def _cascade_extract(manufacturer: str, prodname: str) -> dict:
+    """Extract with the cheapest model in PERPLEXITY_CASCADE, moving up only while the result is weak."""
+    best = None
+    for tier, model in enumerate(PERPLEXITY_CASCADE):
+        try:
+            fields = extract_via_perplexity(manufacturer, prodname, model=model)
+        except Exception as e:
+            fields = _unknown_fields(e)
+        best, escalate = _cascade_step(manufacturer, prodname, model, fields, best, tier == len(PERPLEXITY_CASCADE) - 1)
+        if not escalate:
+            break
+    return best[1]
+
+
+async def _acascade_extract(manufacturer: str, prodname: str) -> dict:
+    best = None
+    for tier, model in enumerate(PERPLEXITY_CASCADE):
+        try:
+            fields = await aextract_via_perplexity(manufacturer, prodname, model=model)
+        except Exception as e:
+            fields = _unknown_fields(e)
+        # Judging the result reads the local dictionary, which may poll SQLite: keep it off the loop.
+        best, escalate = await asyncio.to_thread(
+            _cascade_step, manufacturer, prodname, model, fields, best, tier == len(PERPLEXITY_CASCADE) - 1
+        )
+        if not escalate:
+            break
+    return best[1]
+
 
+def cascade_stats() -> dict:
+    """
+    Per cascade tier: lookups, escalations and their rate, reasons for weak results (errors
+    included, though they do not escalate), Perplexity requests, estimated cost and mean
+    request latency; plus the mean extraction cost per pump looked up.
+    """
+    usage = perplexity_usage()["models"]
+    with _cascade_lock:
+        tiers = {model: {**tier, "reasons": dict(tier["reasons"])} for model, tier in _cascade.items()}
+    for model, tier in tiers.items():
+        spent = usage.get(model, {})
+        tier["escalation_rate"] = round(tier["escalated"] / tier["lookups"], 3) if tier["lookups"] else 0.0
+        tier["requests"] = spent.get("requests", 0)
+        tier["cost_usd"] = round(spent.get("cost_usd", 0.0), 5)
+        tier["mean_latency_s"] = round(spent["latency_s"] / spent["requests"], 3) if spent.get("requests") else None
+    first = tiers.get(PERPLEXITY_CASCADE[0], {}).get("lookups", 0)
+    cost = sum(usage.get(model, {}).get("cost_usd", 0.0) for model in PERPLEXITY_CASCADE)
+    return {
+        "models": PERPLEXITY_CASCADE,
+        "lookups": first,
+        "mean_cost_usd": round(cost / first, 5) if first else 0.0,
+        "tiers": tiers,
+    }
+
+
+def _web_result(manufacturer: str, prodname: str, fields: dict) -> dict:
     result = normalize_result(fields)
 
     local = get_from_db(manufacturer, prodname)
@@ -314,38 +594,322 @@ def lookup_pump(manufacturer: str, prodname: str, force_web: bool = False) -> di
     result["MANUFACTURER"] = manufacturer
     result["PRODNAME"] = prodname
     result["_source"] = "web_search"
+    if "_error" in fields:
+        # The lookup failed (quota, outage): say so rather than pass it off as "not found"
+        result["_error"] = fields["_error"]
+    if "_model" in fields:
+        result["_model"] = fields["_model"]
     return result
 
 
-def lookup_pump_hybrid(manufacturer: str, prodname: str, force_web: bool = True) -> dict:
+def _remember_web_result(result: dict) -> dict:
+    """Keep the latest completed web lookup per pump for stale-while-revalidate serving."""
+    if result.get("_source") == "web_search" and "_error" not in result:
+        key = PumpDictionary._make_key(result["MANUFACTURER"], result["PRODNAME"])
+        cache_set("web_result", {"result": result, "fetched_at": time.time()}, key)
+    return result
+
+
+def lookup_pump(manufacturer: str, prodname: str, force_web: bool = False) -> dict:
+    result = _lookup_without_web(manufacturer, prodname, force_web)
+    if result is not None:
+        return result
+
+    fields = _extract_fields(manufacturer, prodname)
+    return _remember_web_result(_web_result(manufacturer, prodname, fields))
+
+
+async def alookup_pump(manufacturer: str, prodname: str, force_web: bool = False) -> dict:
     """
-    Hybrid retrieval: fetch web, compare against local JSON DB, and return comparison metadata.
+    Async lookup_pump for the web apps: the Perplexity call is awaited, not run on a worker
+    thread. The SQLite cache and the local dictionary (which polls SQLite) are synchronous,
+    so their reads and writes go to a thread.
     """
-    local_result = get_from_db(manufacturer, prodname)
-    web_result = lookup_pump(manufacturer, prodname, force_web=force_web)
+    result = await asyncio.to_thread(_lookup_without_web, manufacturer, prodname, force_web)
+    if result is not None:
+        return result
+
+    fields = await _aextract_fields(manufacturer, prodname)
+    return await asyncio.to_thread(lambda: _remember_web_result(_web_result(manufacturer, prodname, fields)))
+
 
+def lookup_pumps_batch(
+    pumps: list[tuple[str, str]], force_web: bool = False, batch_size: int | None = None
+) -> list[dict]:
+    """
+    lookup_pump for many (manufacturer, prodname) pairs, in input order. Local and
+    negative-cache answers are served first; the remaining pumps (each distinct key once)
+    go to Perplexity several per request.
+    """
+    results = [_lookup_without_web(manufacturer, prodname, force_web) for manufacturer, prodname in pumps]
+    pending = {}
+    for i, (manufacturer, prodname) in enumerate(pumps):
+        if results[i] is None:
+            pending.setdefault(PumpDictionary._make_key(manufacturer, prodname), []).append(i)
+    if not pending:
+        return results
+
+    first = [indices[0] for indices in pending.values()]
+    kwargs = {"batch_size": batch_size} if batch_size else {}
+    # The cascade runs batch by batch: only the pumps a tier answered weakly go up to the next.
+    best = {}
+    remaining = first
+    for tier, model in enumerate(PERPLEXITY_CASCADE):
+        try:
+            extracted = extract_batch_via_perplexity([pumps[i] for i in remaining], model=model, **kwargs)
+        except Exception as e:
+            extracted = [_unknown_fields(e)] * len(remaining)
+        escalated = []
+        last = tier == len(PERPLEXITY_CASCADE) - 1
+        for i, fields in zip(remaining, extracted):
+            best[i], escalate = _cascade_step(pumps[i][0], pumps[i][1], model, fields, best.get(i), last)
+            if escalate:
+                escalated.append(i)
+        remaining = escalated
+        if not remaining:
+            break
+
+    for indices in pending.values():
+        manufacturer, prodname = pumps[indices[0]]
+        fields = _record_fields(manufacturer, prodname, best[indices[0]][1])
+        for i in indices:
+            results[i] = _remember_web_result(_web_result(pumps[i][0], pumps[i][1], fields))
+    return results
+
+
+def _hybrid_result(manufacturer: str, prodname: str, web_result: dict, local_result) -> dict:
     comparison = _build_hybrid_comparison(web_result, local_result)
 
     return {
         "MANUFACTURER": manufacturer,
         "PRODNAME": prodname,
         "web_result": web_result,
-        "local_result": local_result or {"FLOWNOM56": "unknown", "HEADNOM56": "unknown", "PHASE": "unknown"},
+        "local_result": dict(local_result) if local_result else {"FLOWNOM56": "unknown", "HEADNOM56": "unknown", "PHASE": "unknown"},
         "hybrid_comparison": comparison,
     }
 
 
-def answer_about_pump(manufacturer: str, prodname: str, question: str) -> str | None:
-    """Ask a free-form question about a pump, using local DB specs as context."""
+def lookup_pump_hybrid(manufacturer: str, prodname: str, force_web: bool = True) -> dict:
+    """
+    Hybrid retrieval: fetch web, compare against local JSON DB, and return comparison metadata.
+    """
+    local_result = get_from_db(manufacturer, prodname)
+    web_result = lookup_pump(manufacturer, prodname, force_web=force_web)
+    return _hybrid_result(manufacturer, prodname, web_result, local_result)
+
+
+async def alookup_pump_hybrid(manufacturer: str, prodname: str, force_web: bool = True) -> dict:
+    local_result = await asyncio.to_thread(get_from_db, manufacturer, prodname)
+    web_result = await alookup_pump(manufacturer, prodname, force_web=force_web)
+    return _hybrid_result(manufacturer, prodname, web_result, local_result)
+
+
+# Stale-while-revalidate: background refreshes by pump key, and when each pump was last tried.
+# A failed refresh is retried after SWR_RETRY_INTERVAL (or the freshness window, if shorter).
+# Attempts are kept oldest first and dropped once they succeed or their back-off has passed.
+SWR_RETRY_INTERVAL = 300
+_refreshes = {}
+_refresh_attempts = OrderedDict()
+
+
+def _freshness(state: str, age: float | None, refreshing: bool) -> dict:
+    return {"state": state, "age_s": None if age is None else round(age, 1), "refreshing": refreshing}
+
+
+async def _refresh(manufacturer: str, prodname: str) -> dict | None:
+    try:
+        result = await alookup_pump_hybrid(manufacturer, prodname, force_web=True)
+    except Exception as e:
+        print(f"Background refresh failed for {manufacturer} {prodname}: {e}")
+        return None
+    if "_error" in result["web_result"]:
+        # The lookup reports its failure (quota, outage) instead of raising: back off the same way.
+        print(f"Background refresh failed for {manufacturer} {prodname}: {result['web_result']['_error']}")
+        return None
+    result["freshness"] = _freshness("fresh", 0.0, False)
+    return result
+
+
+def _start_refresh(manufacturer: str, prodname: str, key: str) -> asyncio.Task | None:
+    """The running refresh of this pump, a newly started one, or None if it was tried too recently."""
+    loop = asyncio.get_running_loop()
+    task = _refreshes.get(key)
+    if task is not None and not task.done() and task.get_loop() is loop:
+        return task
+    now = time.time()
+    backoff = min(WEB_FRESHNESS_WINDOW, SWR_RETRY_INTERVAL)
+    while _refresh_attempts and now - next(iter(_refresh_attempts.values())) >= backoff:
+        _refresh_attempts.popitem(last=False)
+    if key in _refresh_attempts:
+        return None
+    _refresh_attempts[key] = now
+    # The dict holds the only strong reference, so the task is not collected mid-flight.
+    task = _refreshes[key] = loop.create_task(_refresh(manufacturer, prodname))
+    task.add_done_callback(lambda done: _refresh_done(key, done))
+    return task
+
+
+def _refresh_done(key: str, task: asyncio.Task):
+    if _refreshes.get(key) is task:
+        _refreshes.pop(key, None)
+    if not task.cancelled() and task.result() is not None:
+        # Succeeded: the next stale read may refresh again without waiting out the back-off.
+        _refresh_attempts.pop(key, None)
+
+
+async def alookup_pump_hybrid_swr(manufacturer: str, prodname: str) -> tuple[dict, asyncio.Task | None]:
+    """
+    Stale-while-revalidate alookup_pump_hybrid. Answers at once from the pump's last web
+    result, or from the local catalogue alone if it was never looked up, and refreshes from
+    the web in the background once that result is older than WEB_FRESHNESS_WINDOW.
+
+    Returns the result, whose "freshness" gives its state ("fresh", "stale" or "local") and
+    age, and the refresh task (None when no refresh runs), which resolves to the refreshed
+    result. A pump with nothing to serve is looked up on the web before returning.
+    """
+    key = PumpDictionary._make_key(manufacturer, prodname)
+    local_result = await asyncio.to_thread(get_from_db, manufacturer, prodname)
+    cached = await acache_get("web_result", key)
+    if cached is None and not local_result:
+        result = await alookup_pump_hybrid(manufacturer, prodname, force_web=True)
+        result["freshness"] = _freshness("fresh", 0.0, False)
+        return result, None
+
+    age = time.time() - cached["fetched_at"] if cached else None
+    fresh = age is not None and age < WEB_FRESHNESS_WINDOW
+    refresh = None if fresh else _start_refresh(manufacturer, prodname, key)
+    if cached:
+        result = _hybrid_result(manufacturer, prodname, dict(cached["result"]), local_result)
+    else:
+        # Catalogue values stand in until the web answers; there is nothing to compare yet.
+        result = _hybrid_result(manufacturer, prodname, {**dict(local_result), "_source": "local_db"}, local_result)
+        result["hybrid_comparison"] = None
+    result["freshness"] = _freshness("fresh" if fresh else ("stale" if cached else "local"), age, refresh is not None)
+    return result, refresh
+
+
+def _local_specs(manufacturer: str, prodname: str) -> tuple[str, str, str]:
     local = get_from_db(manufacturer, prodname)
     flow = str(local.get("FLOWNOM56", "unknown")) if local else "unknown"
     head = str(local.get("HEADNOM56", "unknown")) if local else "unknown"
     phase = str(local.get("PHASE", "unknown")) if local else "unknown"
+    return flow, head, phase
+
+
+def _question_tokens(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+
+def _canonical_question(question: str, ignore: set = frozenset()) -> str:
+    """Lowercased, punctuation-free, stopword-free question tokens in sorted order."""
+    return " ".join(sorted(_question_tokens(question) - QUESTION_STOPWORDS - ignore))
+
+
+def _answer_key(manufacturer: str, prodname: str, question: str, specs: tuple[str, str, str]) -> tuple:
+    # The specs are part of the key, so an answer given against old local data is never
+    # served once the catalogue changes; the stale entry just ages out.
+    # Tokens of the pump name itself are dropped: the key already identifies the pump, and
+    # "what is the TACO 0014-SF1 used for" should match "what is it used for".
+    name = _question_tokens(f"{manufacturer} {prodname}")
+    return PumpDictionary._make_key(manufacturer, prodname), _canonical_question(question, name), "|".join(specs)
+
+
+def answer_about_pump(manufacturer: str, prodname: str, question: str) -> str | None:
+    """Ask a free-form question about a pump, using local DB specs as context."""
+    flow, head, phase = specs = _local_specs(manufacturer, prodname)
+    key = _answer_key(manufacturer, prodname, question, specs)
+    cached = cache_get("answer", *key)
+    if cached:
+        return cached
 
     try:
-        return answer_pump_question(manufacturer, prodname, question, flow, head, phase)
+        answer = answer_pump_question(manufacturer, prodname, question, flow, head, phase)
     except Exception:
         return None
+    if answer:
+        cache_set("answer", answer, *key)
+    return answer
+
+
+async def aanswer_about_pump(manufacturer: str, prodname: str, question: str) -> str | None:
+    flow, head, phase = specs = await asyncio.to_thread(_local_specs, manufacturer, prodname)
+    key = _answer_key(manufacturer, prodname, question, specs)
+    cached = await acache_get("answer", *key)
+    if cached:
+        return cached
+
+    try:
+        answer = await aanswer_pump_question(manufacturer, prodname, question, flow, head, phase)
+    except Exception:
+        return None
+    if answer:
+        await acache_set("answer", answer, *key)
+    return answer
+
+
+async def astream_answer_about_pump(manufacturer: str, prodname: str, question: str):
+    """
+    aanswer_about_pump as a stream of text chunks. Errors end the stream early instead of
+    raising, so callers can fall back when nothing was produced.
+    """
+    flow, head, phase = specs = await asyncio.to_thread(_local_specs, manufacturer, prodname)
+    key = _answer_key(manufacturer, prodname, question, specs)
+    cached = await acache_get("answer", *key)
+    if cached:
+        yield cached
+        return
+
+    parts = []
+    try:
+        async for chunk in astream_pump_question(manufacturer, prodname, question, flow, head, phase):
+            parts.append(chunk)
+            yield chunk
+    except Exception as e:
+        print(f"Answer stream failed: {e}")
+        return
+    # Only a stream that ran to the end is cached; a cut-off answer would be served forever.
+    if parts:
+        await acache_set("answer", "".join(parts), *key)
+
+
+def match_duty_point(
+    flow: float,
+    head: float,
+    phase=None,
+    manufacturer: str | None = None,
+    k: int = 10,
+    tolerance: float | None = None,
+) -> list[dict]:
+    """
+    Replacement candidates from the local catalogue for a duty point, closest first.
+    With a tolerance (0.2 = +/-20% on flow and head) only pumps inside that box are
+    considered; otherwise the k nearest are returned whatever their distance.
+    Raises ValueError unless 0 < tolerance < 1.
+    """
+    if tolerance is not None and not 0 < tolerance < 1:
+        raise ValueError("tolerance must be between 0 and 1 (e.g. 0.2 for +/-20%)")
+    if tolerance is not None:
+        records = pump_dictionary.find_pumps_in_range(
+            flow * (1 - tolerance), flow * (1 + tolerance),
+            head * (1 - tolerance), head * (1 + tolerance),
+            phase=phase, manufacturer=manufacturer,
+        )
+        hits = [
+            (r, math.hypot(math.log(r["FLOWNOM56"] / flow), math.log(r["HEADNOM56"] / head)))
+            for r in records
+        ]
+        hits = sorted(hits, key=lambda item: item[1])[:k]
+    else:
+        hits = pump_dictionary.find_nearest_pumps(flow, head, phase=phase, manufacturer=manufacturer, k=k)
+
+    matches = []
+    for record, distance in hits:
+        match = dict(record)
+        match["flow_deviation"] = round((record["FLOWNOM56"] - flow) / flow, 3)
+        match["head_deviation"] = round((record["HEADNOM56"] - head) / head, 3)
+        match["distance"] = round(distance, 4)
+        matches.append(match)
+    return matches
 
 
 if __name__ == "__main__":
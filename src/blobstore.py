@@ -0,0 +1,128 @@
+import hashlib
+import os
+import time
+import zlib
+from src.cache import cache_get, cache_set, cache_values
+from src.config import CACHE_DIR
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BLOB_DIR = os.path.join(CACHE_DIR, "blobs")
+# Unreferenced blobs younger than this are kept: another process may be about to index them.
+BLOB_GC_GRACE = 3600
+
+# Readers accept either format, so switching compressors never strands old blobs.
+_SUFFIX_ZSTD = ".zst"
+_SUFFIX_ZLIB = ".z"
+
+
+def _blob_path(digest: str, suffix: str) -> str:
+    return os.path.join(BLOB_DIR, digest[:2], digest + suffix)
+
+
+def _compress(content: bytes) -> tuple[bytes, str]:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(content), _SUFFIX_ZSTD
+    return zlib.compress(content, 6), _SUFFIX_ZLIB
+
+
+def _readable_suffixes() -> tuple:
+    return (_SUFFIX_ZSTD, _SUFFIX_ZLIB) if zstandard is not None else (_SUFFIX_ZLIB,)
+
+
+def has_blob(digest: str) -> bool:
+    return any(os.path.exists(_blob_path(digest, s)) for s in _readable_suffixes())
+
+
+def put_blob(content: bytes) -> str:
+    """Store content under its SHA-256 digest (once, however many URLs serve it) and return the digest."""
+    digest = hashlib.sha256(content).hexdigest()
+    for suffix in _readable_suffixes():
+        try:
+            # Already stored: bump its mtime so a concurrent collect_blobs() keeps it.
+            os.utime(_blob_path(digest, suffix))
+            return digest
+        except OSError:
+            pass
+    data, suffix = _compress(content)
+    path = _blob_path(digest, suffix)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return digest
+
+
+def get_blob(digest: str) -> bytes | None:
+    path = _blob_path(digest, _SUFFIX_ZSTD)
+    # Without zstandard a .zst copy is unreadable; a .z copy may still exist.
+    if zstandard is not None and os.path.exists(path):
+        with open(path, "rb") as f:
+            return zstandard.ZstdDecompressor().decompress(f.read())
+    path = _blob_path(digest, _SUFFIX_ZLIB)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return zlib.decompress(f.read())
+    return None
+
+
+def collect_blobs(grace: float = BLOB_GC_GRACE) -> dict:
+    """
+    Delete blobs that no URL index entry points at any more (their entries expired or were
+    evicted), and abandoned temp files. Returns the number of files deleted and bytes freed.
+    """
+    referenced = {entry.get("hash") for entry in cache_values("blob_url") if isinstance(entry, dict)}
+    cutoff = time.time() - grace
+    deleted = freed = 0
+    for root, _, files in os.walk(BLOB_DIR):
+        for name in files:
+            if name.split(".", 1)[0] in referenced and not name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+                if st.st_mtime > cutoff:
+                    continue
+                os.remove(path)
+            except OSError:
+                continue
+            deleted += 1
+            freed += st.st_size
+    return {"deleted": deleted, "freed_bytes": freed}
+
+
+def store_url(url: str, content: bytes, content_type: str, **meta) -> dict:
+    """Store a fetched body and point the URL index at it. Extra metadata is kept on the index entry."""
+    entry = {"hash": put_blob(content), "content_type": content_type, "ts": time.time(), **meta}
+    cache_set("blob_url", entry, url)
+    return entry
+
+
+def touch_url(url: str, **meta) -> dict | None:
+    """Mark a URL's stored body as freshly validated (e.g. after a 304), updating its metadata."""
+    entry = lookup_url(url)
+    if not entry:
+        return None
+    entry = {**entry, **meta, "ts": time.time()}
+    cache_set("blob_url", entry, url)
+    return entry
+
+
+def lookup_url(url: str) -> dict | None:
+    """Index entry for a URL: content hash, content type and fetch time."""
+    return cache_get("blob_url", url)
+
+
+def load_url(url: str) -> tuple[bytes, str] | None:
+    """Raw body and content type last fetched from a URL, without touching the network."""
+    entry = lookup_url(url)
+    if not entry:
+        return None
+    content = get_blob(entry["hash"])
+    if content is None:
+        return None
+    return content, entry.get("content_type", "")
@@ -3,23 +3,196 @@ import hashlib
 import json
 import time
 import os
-from src.config import CACHE_DIR
+import queue
+import atexit
+import asyncio
+import argparse
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from src.config import CACHE_DIR, ANSWER_CACHE_TTL
 
 DB_PATH = os.path.join(CACHE_DIR, "pump_cache.db")
 
 TTL_SEARCH = 86400 * 1
 TTL_PAGE = 86400 * 7
 TTL_EXTRACTION = 0
+TTL_NEGATIVE = 86400 * 7
+TTL_ANSWER = ANSWER_CACHE_TTL
+# URL -> blob index; fetches revalidate (and re-stamp) entries long before this
+TTL_BLOB_URL = 86400 * 30
 
+POOL_SIZE = int(os.environ.get("CACHE_POOL_SIZE", "4"))
+WRITE_BATCH_SIZE = 32
+WRITE_FLUSH_INTERVAL = 0.5
 
-def _get_conn():
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute(
-        "CREATE TABLE IF NOT EXISTS cache "
-        "(key TEXT PRIMARY KEY, value TEXT, ts REAL, category TEXT)"
-    )
-    return conn
+# Max entries held in memory per category; unlisted categories use the default.
+MEMORY_LIMITS = {"search": 512, "page": 128, "extraction": 2048, "answer": 1024, "web_result": 2048}
+MEMORY_LIMIT_DEFAULT = 256
+# Categories other workers overwrite (a lookup that now fails or succeeds elsewhere): memory
+# copies are re-read from disk after this many seconds, whatever the category's TTL.
+MEMORY_MAX_AGE = {"negative": 5, "web_result": 5}
+
+# Per-category caps enforced by run_maintenance(); either limit may be omitted.
+CACHE_QUOTAS = {
+    "search": {"max_rows": 20000, "max_bytes": 64 * 1024 * 1024},
+    "page": {"max_rows": 5000, "max_bytes": 256 * 1024 * 1024},
+    "extraction": {"max_rows": 50000},
+    "parsed": {"max_rows": 20000, "max_bytes": 128 * 1024 * 1024},
+    "answer": {"max_rows": 20000, "max_bytes": 32 * 1024 * 1024},
+    "web_result": {"max_rows": 50000},
+    # Bodies live in blob files; run_maintenance() deletes the ones no index row points at.
+    "blob_url": {"max_rows": 5000},
+}
+MAINTENANCE_INTERVAL = 3600
+AGE_BUCKETS = [("<1h", 3600), ("<1d", 86400), ("<7d", 86400 * 7), ("<30d", 86400 * 30)]
+
+
+class _ConnectionPool:
+    """Process-wide pool of SQLite connections to one WAL-mode database."""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = max(1, size)
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        if self._created == 0:
+            # Must come before journal_mode=WAL, which writes the header of a fresh file.
+            # On an existing file it is a no-op; compact() converts it with one VACUUM.
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if self._created == 0:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value TEXT, ts REAL, category TEXT, atime REAL, hits INTEGER DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+            if "atime" not in columns:
+                conn.execute("ALTER TABLE cache ADD COLUMN atime REAL")
+            if "hits" not in columns:
+                conn.execute("ALTER TABLE cache ADD COLUMN hits INTEGER DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_category_ts ON cache (category, ts)")
+            conn.commit()
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.size:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    conn = self._connect()
+                    self._created += 1
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class _MemoryTier:
+    """
+    Per-category LRU of decoded values, honouring the same TTLs as the disk cache. Entries of
+    a category in `max_ages` are also dropped that many seconds after they were loaded.
+    """
+
+    def __init__(self, limits: dict, default_limit: int, max_ages: dict | None = None):
+        self.limits = limits
+        self.default_limit = default_limit
+        self.max_ages = max_ages or {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, category: str, key: str, ttl: int):
+        with self._lock:
+            entries = self._entries.get(category)
+            item = entries.get(key) if entries else None
+            if item is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            max_age = self.max_ages.get(category)
+            if (ttl > 0 and (now - item[1]) > ttl) or (max_age is not None and now - item[2] > max_age):
+                del entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, category: str, key: str, value, ts: float):
+        limit = self.limits.get(category, self.default_limit)
+        if limit <= 0:
+            return
+        with self._lock:
+            entries = self._entries.setdefault(category, OrderedDict())
+            entries[key] = (value, ts, time.time())
+            entries.move_to_end(key)
+            while len(entries) > limit:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": {category: len(entries) for category, entries in self._entries.items()},
+            }
+
+
+_memory = _MemoryTier(MEMORY_LIMITS, MEMORY_LIMIT_DEFAULT, MEMORY_MAX_AGE)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Writes are buffered here and committed together in one transaction.
+_pending = {}
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flush_timer = None
+# Read counts since the last flush, used for LRU/LFU eviction on disk.
+_accessed = {}
+
+
+def _get_pool() -> _ConnectionPool:
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        # A pool inherited across fork() must not be reused by the child.
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = _ConnectionPool(DB_PATH, POOL_SIZE)
+        return _pool
 
 
 def _make_key(*parts):
@@ -27,29 +200,248 @@ def _make_key(*parts):
     return hashlib.sha256(raw.encode()).hexdigest()
 
 
+def _ttl_for(category: str) -> int:
+    return {
+        "search": TTL_SEARCH,
+        "page": TTL_PAGE,
+        "extraction": TTL_EXTRACTION,
+        "negative": TTL_NEGATIVE,
+        "answer": TTL_ANSWER,
+        "blob_url": TTL_BLOB_URL,
+    }.get(category, 0)
+
+
 def cache_get(category: str, *key_parts):
-    ttl = {"search": TTL_SEARCH, "page": TTL_PAGE, "extraction": TTL_EXTRACTION}.get(
-        category, 0
-    )
-    conn = _get_conn()
+    """Return the cached value or None. Values are shared with the memory tier; do not mutate them."""
+    ttl = _ttl_for(category)
     key = _make_key(category, *key_parts)
-    row = conn.execute(
-        "SELECT value, ts FROM cache WHERE key = ? AND category = ?", (key, category)
-    ).fetchone()
-    conn.close()
+    item = _memory.get(category, key, ttl)
+    if item is not None:
+        _record_access(key)
+        return item[0]
+    with _pending_lock:
+        row = _pending.get(key)
+    if row is not None:
+        row = row[:2]
+    else:
+        with _get_pool().connection() as conn:
+            row = conn.execute(
+                "SELECT value, ts FROM cache WHERE key = ? AND category = ?", (key, category)
+            ).fetchone()
     if row is None:
         return None
     if ttl > 0 and (time.time() - row[1]) > ttl:
         return None
-    return json.loads(row[0])
+    value = json.loads(row[0])
+    _memory.put(category, key, value, row[1])
+    _record_access(key)
+    return value
+
+
+def _schedule_flush():
+    """Start the flush timer if none is pending. Callers hold _pending_lock."""
+    global _flush_timer
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(WRITE_FLUSH_INTERVAL, cache_flush)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def _record_access(key: str):
+    with _pending_lock:
+        _accessed[key] = _accessed.get(key, 0) + 1
+        # Read-only traffic must still reach disk, or eviction sees stale atime/hits.
+        _schedule_flush()
 
 
 def cache_set(category: str, value, *key_parts):
-    conn = _get_conn()
     key = _make_key(category, *key_parts)
-    conn.execute(
-        "INSERT OR REPLACE INTO cache (key, value, ts, category) VALUES (?, ?, ?, ?)",
-        (key, json.dumps(value), time.time(), category),
-    )
-    conn.commit()
-    conn.close()
+    row = (json.dumps(value), time.time(), category)
+    _memory.put(category, key, value, row[1])
+    with _pending_lock:
+        _pending[key] = row
+        flush_now = len(_pending) >= WRITE_BATCH_SIZE
+        if not flush_now:
+            _schedule_flush()
+    if flush_now:
+        cache_flush()
+
+
+def cache_stats() -> dict:
+    """Hit/miss/eviction counters and per-category sizes of the in-memory tier."""
+    return _memory.stats()
+
+
+def cache_flush():
+    """Commit all buffered writes in a single transaction."""
+    global _flush_timer, _accessed
+    with _flush_lock:
+        with _pending_lock:
+            if _flush_timer is not None:
+                _flush_timer.cancel()
+                _flush_timer = None
+            if not _pending and not _accessed:
+                return
+            batch = list(_pending.items())
+            accessed, _accessed = _accessed, {}
+        now = time.time()
+        with _get_pool().connection() as conn:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO cache (key, value, ts, category, atime, hits) VALUES (?, ?, ?, ?, ?, 0)",
+                    [(key, value, ts, category, ts) for key, (value, ts, category) in batch],
+                )
+                conn.executemany(
+                    "UPDATE cache SET atime = ?, hits = hits + ? WHERE key = ?",
+                    [(now, count, key) for key, count in accessed.items()],
+                )
+        # Rows stay readable from the buffer until committed; keep any rewritten meanwhile.
+        with _pending_lock:
+            for key, row in batch:
+                if _pending.get(key) is row:
+                    del _pending[key]
+
+
+async def acache_get(category: str, *key_parts):
+    return await asyncio.to_thread(cache_get, category, *key_parts)
+
+
+async def acache_set(category: str, value, *key_parts):
+    await asyncio.to_thread(cache_set, category, value, *key_parts)
+
+
+def cache_values(category: str) -> list:
+    """Decoded values of every row stored in a category."""
+    cache_flush()
+    with _get_pool().connection() as conn:
+        return [json.loads(value) for (value,) in conn.execute("SELECT value FROM cache WHERE category = ?", (category,))]
+
+
+def purge_expired(category: str | None = None) -> dict:
+    """Delete rows past their category TTL. Returns deleted row counts per category."""
+    cache_flush()
+    now = time.time()
+    deleted = {}
+    with _get_pool().connection() as conn:
+        categories = [category] if category else [r[0] for r in conn.execute("SELECT DISTINCT category FROM cache")]
+        with conn:
+            for cat in categories:
+                ttl = _ttl_for(cat)
+                if ttl <= 0:
+                    continue
+                cur = conn.execute("DELETE FROM cache WHERE category = ? AND ts < ?", (cat, now - ttl))
+                deleted[cat] = cur.rowcount
+    return deleted
+
+
+def enforce_quotas(quotas: dict | None = None, policy: str = "lru") -> dict:
+    """
+    Evict rows until each category is within its max_rows/max_bytes quota.
+    policy "lru" evicts the least recently read rows first, "lfu" the least often read.
+    """
+    if policy not in ("lru", "lfu"):
+        raise ValueError(f"Unknown eviction policy: {policy}")
+    quotas = CACHE_QUOTAS if quotas is None else quotas
+    order = "COALESCE(atime, ts)" if policy == "lru" else "hits, COALESCE(atime, ts)"
+    cache_flush()
+    evicted = {}
+    with _get_pool().connection() as conn:
+        with conn:
+            for cat, quota in quotas.items():
+                rows, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache WHERE category = ?", (cat,)
+                ).fetchone()
+                excess_rows = max(0, rows - quota.get("max_rows", rows))
+                excess_bytes = max(0, size - quota.get("max_bytes", size))
+                if not excess_rows and not excess_bytes:
+                    continue
+                victims = []
+                freed = 0
+                for key, length in conn.execute(
+                    f"SELECT key, LENGTH(value) FROM cache WHERE category = ? ORDER BY {order}", (cat,)
+                ):
+                    if len(victims) >= excess_rows and freed >= excess_bytes:
+                        break
+                    victims.append((key,))
+                    freed += length or 0
+                conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+                evicted[cat] = len(victims)
+    if evicted:
+        _memory.clear()
+    return evicted
+
+
+def compact(max_pages: int | None = None):
+    """Return free pages to the filesystem and truncate the WAL."""
+    with _get_pool().connection() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Switching an existing database to incremental mode needs one full VACUUM.
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        elif max_pages:
+            conn.execute(f"PRAGMA incremental_vacuum({int(max_pages)})")
+        else:
+            conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def cache_report() -> dict:
+    """Row counts, stored bytes and an age histogram per category, plus on-disk file size."""
+    cache_flush()
+    now = time.time()
+    buckets = " ".join(f"WHEN ? - ts < {limit} THEN '{label}'" for label, limit in AGE_BUCKETS)
+    report = {"categories": {}, "file_bytes": 0}
+    with _get_pool().connection() as conn:
+        for cat, rows, size in conn.execute(
+            "SELECT category, COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache GROUP BY category"
+        ):
+            report["categories"][cat] = {"rows": rows, "bytes": size, "ages": {}}
+        for cat, bucket, rows in conn.execute(
+            f"SELECT category, CASE {buckets} ELSE 'older' END AS bucket, COUNT(*) "
+            "FROM cache GROUP BY category, bucket",
+            [now] * len(AGE_BUCKETS),
+        ):
+            report["categories"][cat]["ages"][bucket] = rows
+    for suffix in ("", "-wal"):
+        if os.path.exists(DB_PATH + suffix):
+            report["file_bytes"] += os.path.getsize(DB_PATH + suffix)
+    return report
+
+
+def run_maintenance(policy: str = "lru") -> dict:
+    """Purge expired rows, enforce CACHE_QUOTAS, delete unreferenced blobs and compact the file."""
+    from src.blobstore import collect_blobs
+
+    purged = purge_expired()
+    evicted = enforce_quotas(policy=policy)
+    blobs = collect_blobs()
+    compact()
+    return {"purged": purged, "evicted": evicted, "blobs": blobs, "report": cache_report()}
+
+
+def start_maintenance(interval: float = MAINTENANCE_INTERVAL, policy: str = "lru") -> threading.Event:
+    """Run maintenance every `interval` seconds on a daemon thread. Set the returned event to stop it."""
+    stop = threading.Event()
+
+    def _loop():
+        while not stop.wait(interval):
+            try:
+                run_maintenance(policy)
+            except sqlite3.Error as e:
+                print(f"Cache maintenance failed: {e}")
+
+    threading.Thread(target=_loop, name="cache-maintenance", daemon=True).start()
+    return stop
+
+
+atexit.register(cache_flush)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pump cache maintenance")
+    parser.add_argument("command", choices=["maintain", "report"], help="Run maintenance or only print the report")
+    parser.add_argument("--policy", choices=["lru", "lfu"], default="lru", help="Eviction policy for quotas")
+    args = parser.parse_args()
+
+    result = run_maintenance(args.policy) if args.command == "maintain" else cache_report()
+    print(json.dumps(result, indent=2))
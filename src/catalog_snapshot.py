@@ -0,0 +1,185 @@
+"""
+Binary snapshot of the pump catalogue, so start-up can skip JSON parsing and normalization.
+
+    python -m src.catalog_snapshot [--source tableConvert.com_oj4t4q.json]
+
+The header stamps the source file's mtime and size; PumpDictionary falls back to the JSON
+source whenever the snapshot is missing or stale.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import struct
+import numpy as np
+from src.config import DATA_DIR, DATASET_PATH
+from src.normalizer import normalize_phase
+
+CATALOG_SNAPSHOT_FILE = os.path.join(DATA_DIR, "pump_catalog.bin")
+# Catalogues compiled when no --source is given, first existing one wins
+DEFAULT_SOURCES = (
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "tableConvert.com_oj4t4q.json"),
+    DATASET_PATH,
+)
+
+MAGIC = b"PUMPCAT\0"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIdQIII")
+
+
+def _normalize_token(value) -> str:
+    # Same canonical form as PumpDictionary._normalize_token
+    return re.sub(r"[^A-Z0-9]", "", str(value).upper().strip())
+
+
+def _family(prodname) -> str:
+    m = re.match(r"[A-Z0-9]+", str(prodname).upper().strip())
+    return m.group(0) if m else ""
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def read_catalog_rows(source: str) -> list[dict]:
+    """Rows of a tableConvert JSON or Excel catalogue, with upper-cased column names."""
+    if source.lower().endswith((".xlsx", ".xls")):
+        import pandas as pd
+
+        df = pd.read_excel(source)
+        df.columns = [str(c).upper() for c in df.columns]
+        rows = df.to_dict("records")
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        rows = list(raw.values()) if isinstance(raw, dict) else raw
+        rows = [{str(k).upper(): v for k, v in row.items()} for row in rows]
+    for row in rows:
+        # Excel turns "1/3" phase cells into dates; those are three-phase pumps.
+        if isinstance(row.get("PHASE"), datetime.datetime):
+            row["PHASE"] = 3
+    return rows
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def build_snapshot(source: str, output: str = CATALOG_SNAPSHOT_FILE) -> int:
+    """Compile `source` into a snapshot at `output`. Returns the number of rows written."""
+    records = {}
+    for row in read_catalog_rows(source):
+        mfr, prod = row.get("MANUFACTURER"), row.get("PRODNAME")
+        if not mfr or not prod or mfr != mfr or prod != prod:
+            continue
+        key = f"{_normalize_token(mfr)}_{_normalize_token(prod)}"
+        # Later duplicates win but keep the first position, like a dict update.
+        phase = normalize_phase(row.get("PHASE", "unknown"))
+        records[key] = (str(mfr), str(prod), row.get("FLOWNOM56"), row.get("HEADNOM56"), phase)
+
+    manufacturers = sorted({r[0] for r in records.values()})
+    mfr_index = {m: i for i, m in enumerate(manufacturers)}
+    keys = list(records)
+    rows = list(records.values())
+
+    flow = np.array([_to_float(r[2]) for r in rows], dtype="<f4")
+    head = np.array([_to_float(r[3]) for r in rows], dtype="<f4")
+    phase = np.array([r[4] if r[4] in (1, 3) else 0 for r in rows], dtype=np.int8)
+    mfr_ids = np.array([mfr_index[r[0]] for r in rows], dtype="<u2")
+    strings = "\0".join(
+        manufacturers
+        + [_normalize_token(m) for m in manufacturers]
+        + keys
+        + [r[1] for r in rows]
+        + [_family(r[1]) for r in rows]
+    ).encode("utf-8")
+
+    stat = os.stat(source)
+    path = os.path.abspath(source).encode("utf-8")
+    header = _HEADER.pack(MAGIC, VERSION, len(rows), stat.st_mtime, stat.st_size, len(manufacturers), len(strings), len(path))
+
+    tmp = f"{output}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header + path)
+        for block in (flow, head, phase, mfr_ids):
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(block.tobytes())
+        f.write(b"\0" * (_align(f.tell()) - f.tell()))
+        f.write(strings)
+    os.replace(tmp, output)
+    return len(rows)
+
+
+def snapshot_source(path: str = CATALOG_SNAPSHOT_FILE) -> str | None:
+    """The source file recorded in a snapshot's header (current or stale), or None without a usable snapshot."""
+    try:
+        with open(path, "rb") as f:
+            magic, version, *_, path_len = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                return None
+            return f.read(path_len).decode("utf-8")
+    except (struct.error, ValueError, UnicodeDecodeError, OSError):
+        return None
+
+
+def load_snapshot(path: str = CATALOG_SNAPSHOT_FILE) -> dict | None:
+    """
+    Read a snapshot and return its columns, or None when it is missing, corrupt or truncated,
+    from another format version, or older than its source file. The file is read whole
+    (it is small) and the numeric columns are read-only arrays over that buffer.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, n, mtime, size, n_mfr, strings_len, path_len = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            return None
+        offset = _HEADER.size
+        source = data[offset : offset + path_len].decode("utf-8")
+        offset += path_len
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        if stat.st_mtime != mtime or stat.st_size != size:
+            return None
+
+        columns = {"source": source, "source_mtime": mtime}
+        for name, dtype, width in (("flow", "<f4", 4), ("head", "<f4", 4), ("phase", np.int8, 1), ("mfr_ids", "<u2", 2)):
+            offset = _align(offset)
+            columns[name] = np.frombuffer(data, dtype=dtype, count=n, offset=offset)
+            offset += n * width
+        offset = _align(offset)
+        if offset + strings_len != len(data):
+            raise ValueError("snapshot is truncated")
+        strings = data[offset:].decode("utf-8").split("\0") if strings_len else []
+        if len(strings) != 2 * n_mfr + 3 * n:
+            raise ValueError("snapshot string table does not match its header")
+    except FileNotFoundError:
+        return None
+    except (struct.error, ValueError, UnicodeDecodeError, OSError) as e:
+        print(f"Ignoring unreadable catalogue snapshot {path}: {e}")
+        return None
+
+    columns["manufacturers"] = strings[:n_mfr]
+    columns["manufacturer_tokens"] = strings[n_mfr : 2 * n_mfr]
+    columns["keys"] = strings[2 * n_mfr : 2 * n_mfr + n]
+    columns["prodnames"] = strings[2 * n_mfr + n : 2 * n_mfr + 2 * n]
+    columns["families"] = strings[2 * n_mfr + 2 * n : 2 * n_mfr + 3 * n]
+    return columns
+
+
+if __name__ == "__main__":
+    default_source = next((path for path in DEFAULT_SOURCES if os.path.exists(path)), DEFAULT_SOURCES[-1])
+
+    parser = argparse.ArgumentParser(description="Compile the pump catalogue into a binary snapshot")
+    parser.add_argument("--source", "-s", default=default_source, help="tableConvert JSON or Excel catalogue")
+    parser.add_argument("--output", "-o", default=CATALOG_SNAPSHOT_FILE, help="Snapshot file to write")
+    args = parser.parse_args()
+
+    count = build_snapshot(args.source, args.output)
+    print(f"Wrote {count} pumps from {args.source} to {args.output}")
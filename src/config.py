@@ -5,15 +5,50 @@ load_dotenv()
 
 PERPLEXITY_API_KEY = os.environ.get("PERPLEXITY_API_KEY", "")
 PERPLEXITY_MODEL = os.environ.get("PERPLEXITY_MODEL", "sonar")
+# Max concurrent Perplexity requests per process (also the size of the keep-alive pool)
+PERPLEXITY_MAX_CONCURRENCY = int(os.environ.get("PERPLEXITY_MAX_CONCURRENCY", "8"))
+PERPLEXITY_KEEPALIVE = float(os.environ.get("PERPLEXITY_KEEPALIVE", "30"))
+# Requests per minute allowed per API key (0 = unlimited), and retries of 429/5xx/connection errors
+PERPLEXITY_RATE_LIMIT = float(os.environ.get("PERPLEXITY_RATE_LIMIT", "50"))
+PERPLEXITY_MAX_RETRIES = int(os.environ.get("PERPLEXITY_MAX_RETRIES", "4"))
+# Extraction models, cheapest first; a lookup moves to the next one only when the result is weak.
+PERPLEXITY_CASCADE = list(
+    dict.fromkeys(m.strip() for m in os.environ.get("PERPLEXITY_CASCADE", f"{PERPLEXITY_MODEL},sonar-pro").split(",") if m.strip())
+)
+# Escalate when the web result agrees with a local catalogue entry less than this (0-1)
+CASCADE_MIN_CONFIDENCE = float(os.environ.get("CASCADE_MIN_CONFIDENCE", "0.5"))
+# Pumps per request in batched extraction
+PERPLEXITY_BATCH_SIZE = int(os.environ.get("PERPLEXITY_BATCH_SIZE", "10"))
 
 SERPAPI_KEY = os.environ.get("SERPAPI_KEY", "")
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "mistral")
+OLLAMA_RATE_LIMIT = float(os.environ.get("OLLAMA_RATE_LIMIT", "0"))
+OLLAMA_MAX_RETRIES = int(os.environ.get("OLLAMA_MAX_RETRIES", "2"))
+
+# Consecutive upstream failures before an API is treated as down, and how long to fail fast.
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", "30"))
 
 MAX_SOURCES_PER_PUMP = 5
 FETCH_TIMEOUT = 10
 MAX_TEXT_CHARS = 4000
 
+# Back-off window after a lookup finds nothing; doubles on each repeated miss up to the max.
+NEGATIVE_CACHE_TTL = int(os.environ.get("NEGATIVE_CACHE_TTL", "900"))
+NEGATIVE_CACHE_MAX_TTL = int(os.environ.get("NEGATIVE_CACHE_MAX_TTL", str(86400 * 2)))
+
+# How long a cached Q&A answer stays valid; answers are also keyed by the pump's local specs.
+ANSWER_CACHE_TTL = int(os.environ.get("ANSWER_CACHE_TTL", str(86400 * 3)))
+
+# Stale-while-revalidate lookups: a pump's last web result is served as-is while younger than
+# this, and older ones are served at once and refreshed in the background (one fetch per window).
+WEB_FRESHNESS_WINDOW = int(os.environ.get("WEB_FRESHNESS_WINDOW", str(86400)))
+LOOKUP_STALE_WHILE_REVALIDATE = os.environ.get("LOOKUP_STALE_WHILE_REVALIDATE", "1") == "1"
+
+# Seconds between checks of the local catalogue files for hot reload (0 disables the watcher).
+CATALOG_WATCH_INTERVAL = float(os.environ.get("CATALOG_WATCH_INTERVAL", "5"))
+
 CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache")
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 DATASET_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Replacement_pumps.xlsx")
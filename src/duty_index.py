@@ -0,0 +1,148 @@
+import math
+
+# Grid cell size in natural-log units: one cell spans roughly 10% of flow and of head.
+CELL_SIZE = 0.1
+
+
+class DutyPointIndex:
+    """
+    Grid buckets over (ln flow, ln head), partitioned by (manufacturer, phase). Working in
+    log space makes distances relative, so 4 vs 5 m³/h counts the same as 40 vs 50.
+    Pumps without a positive flow and head cannot be placed and are left out.
+    """
+
+    def __init__(self, cell: float = CELL_SIZE):
+        self.cell = cell
+        self._grids = {}
+        self._where = {}
+        # Cell-coordinate bounds over all partitions, so ring searches know when to stop
+        self._bounds = None
+
+    def __len__(self):
+        return len(self._where)
+
+    def _point(self, flow: float, head: float) -> tuple[float, float] | None:
+        if not (flow > 0 and head > 0):
+            return None
+        return math.log(flow), math.log(head)
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return math.floor(x / self.cell), math.floor(y / self.cell)
+
+    def add(self, key: str, manufacturer: str, phase, flow: float, head: float):
+        self.remove(key)
+        point = self._point(flow, head)
+        if point is None:
+            return
+        partition = (manufacturer, phase)
+        cell = self._cell(*point)
+        self._grids.setdefault(partition, {}).setdefault(cell, {})[key] = point
+        self._where[key] = (partition, cell)
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[0], cell[1], cell[1]]
+        else:
+            b = self._bounds
+            b[0], b[1] = min(b[0], cell[0]), max(b[1], cell[0])
+            b[2], b[3] = min(b[2], cell[1]), max(b[3], cell[1])
+
+    def remove(self, key: str):
+        where = self._where.pop(key, None)
+        if where is None:
+            return
+        partition, cell = where
+        grid = self._grids[partition]
+        grid[cell].pop(key, None)
+        if not grid[cell]:
+            del grid[cell]
+        if not grid:
+            del self._grids[partition]
+
+    def _partitions(self, manufacturer: str | None, phase) -> list[dict]:
+        return [
+            grid
+            for (m, p), grid in self._grids.items()
+            if (manufacturer is None or m == manufacturer) and (phase is None or p == phase)
+        ]
+
+    def range(
+        self,
+        flow_min: float,
+        flow_max: float,
+        head_min: float,
+        head_max: float,
+        manufacturer: str | None = None,
+        phase=None,
+    ) -> list[str]:
+        """Keys whose duty point lies inside the flow/head box (inclusive)."""
+        lo, hi = self._point(flow_min, head_min), self._point(flow_max, head_max)
+        if lo is None or hi is None:
+            return []
+        (i0, j0), (i1, j1) = self._cell(*lo), self._cell(*hi)
+        grids = self._partitions(manufacturer, phase)
+        keys = []
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > max(sum(len(g) for g in grids), 1):
+            # A box wider than the occupied grid: scanning the occupied cells is cheaper.
+            cells = [(cell, points) for grid in grids for cell, points in grid.items()]
+        else:
+            cells = [
+                ((i, j), grid[(i, j)])
+                for grid in grids
+                for i in range(i0, i1 + 1)
+                for j in range(j0, j1 + 1)
+                if (i, j) in grid
+            ]
+        for (i, j), points in cells:
+            if not (i0 <= i <= i1 and j0 <= j <= j1):
+                continue
+            for key, (x, y) in points.items():
+                if lo[0] <= x <= hi[0] and lo[1] <= y <= hi[1]:
+                    keys.append(key)
+        return keys
+
+    def nearest(
+        self,
+        flow: float,
+        head: float,
+        k: int = 10,
+        manufacturer: str | None = None,
+        phase=None,
+        max_distance: float | None = None,
+    ) -> list[tuple[str, float]]:
+        """
+        The k keys closest to the duty point, as (key, distance) with distance the Euclidean
+        norm of (ln flow ratio, ln head ratio). Rings of cells are searched outwards until no
+        unvisited cell can hold anything closer than the k-th match found.
+        """
+        target = self._point(flow, head)
+        grids = self._partitions(manufacturer, phase)
+        if target is None or not grids or k <= 0:
+            return []
+        ci, cj = self._cell(*target)
+        b = self._bounds
+        # Gaps (in cells) between the target and the occupied bounds; rings closer in than
+        # the bounds are empty, so a far-off target starts at the bounds.
+        gap_i = max(b[0] - ci, ci - b[1], 0)
+        gap_j = max(b[2] - cj, cj - b[3], 0)
+        max_ring = max(ci - b[0], b[1] - ci, cj - b[2], b[3] - cj, 0)
+        if max_distance is not None:
+            max_ring = min(max_ring, int(max_distance / self.cell) + 1)
+
+        found = []
+        for ring in range(max(gap_i, gap_j), max_ring + 1):
+            # A cell in this ring is (ring - 1) cells away along one axis and at least the gap
+            # to the bounds along the other.
+            near = min(math.hypot(ring - 1, max(gap_j - 1, 0)), math.hypot(max(gap_i - 1, 0), ring - 1))
+            if len(found) >= k and near * self.cell > found[k - 1][1]:
+                break
+            # Only the part of the ring inside the bounds can hold anything.
+            for i in range(max(ci - ring, b[0]), min(ci + ring, b[1]) + 1):
+                on_edge = i in (ci - ring, ci + ring)
+                columns = range(max(cj - ring, b[2]), min(cj + ring, b[3]) + 1) if on_edge else (cj - ring, cj + ring)
+                for j in columns:
+                    for grid in grids:
+                        for key, (x, y) in grid.get((i, j), {}).items():
+                            d = math.hypot(x - target[0], y - target[1])
+                            if max_distance is None or d <= max_distance:
+                                found.append((key, d))
+            found.sort(key=lambda item: item[1])
+        return found[:k]
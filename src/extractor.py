@@ -1,7 +1,15 @@
 import json
 import re
 import requests
-from src.config import OLLAMA_BASE_URL, OLLAMA_MODEL
+from src.config import (
+    OLLAMA_BASE_URL,
+    OLLAMA_MODEL,
+    OLLAMA_RATE_LIMIT,
+    OLLAMA_MAX_RETRIES,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+from src.resilience import ApiGuard, CircuitBreaker, TokenBucket, guard_for, http_status, is_retryable_status
 
 EXTRACTION_PROMPT = """You are a pump data extractor. Given the text below, extract values for pump: {manufacturer} {prodname}
 
@@ -26,18 +34,47 @@ NOMINAL_FLOW_RATIO = 0.55
 NOMINAL_HEAD_RATIO = 0.70
 
 
+def _retryable(error: Exception) -> bool:
+    # Timeouts are not retried: a generation that ran for 180s will most likely do so again.
+    return isinstance(error, requests.ConnectionError) or is_retryable_status(http_status(error))
+
+
+def _timed_out(error: Exception) -> bool:
+    # Not retried (see above), but a server that keeps timing out is down as far as the breaker is concerned.
+    return isinstance(error, requests.Timeout)
+
+
+def _guard() -> ApiGuard:
+    return guard_for(
+        "ollama",
+        OLLAMA_BASE_URL,
+        lambda: ApiGuard(
+            "ollama",
+            TokenBucket(OLLAMA_RATE_LIMIT / 60),
+            _retryable,
+            max_retries=OLLAMA_MAX_RETRIES,
+            breaker=CircuitBreaker("ollama", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT),
+            fail_on=_timed_out,
+        ),
+    )
+
+
+def _generate(prompt: str) -> str:
+    resp = requests.post(
+        f"{OLLAMA_BASE_URL}/api/generate",
+        json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False, "options": {"temperature": 0}},
+        timeout=180,
+    )
+    resp.raise_for_status()
+    return resp.json().get("response", "")
+
+
 def extract_fields(text: str, manufacturer: str, prodname: str) -> dict:
     prompt = EXTRACTION_PROMPT.format(
         manufacturer=manufacturer, prodname=prodname, text=text[:3000]
     )
     try:
-        resp = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False, "options": {"temperature": 0}},
-            timeout=180,
-        )
-        resp.raise_for_status()
-        raw = resp.json().get("response", "")
+        raw = _guard().call(_generate, prompt)
         parsed = _parse_llm_json(raw)
         return _convert_to_target(parsed)
     except Exception as e:
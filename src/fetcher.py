@@ -1,5 +1,8 @@
+import re
+import time
 import requests
-from bs4 import BeautifulSoup
+from src.blobstore import get_blob, has_blob, load_url, store_url, lookup_url, touch_url
+from src.cache import TTL_PAGE, cache_get, cache_set
 from src.config import FETCH_TIMEOUT, MAX_TEXT_CHARS
 
 HEADERS = {
@@ -11,20 +14,92 @@ HEADERS = {
 
 def fetch_page(url: str) -> str | None:
     try:
-        resp = requests.get(url, timeout=FETCH_TIMEOUT, headers=HEADERS, allow_redirects=True)
-        resp.raise_for_status()
-        content_type = resp.headers.get("Content-Type", "")
-        if "pdf" in content_type.lower():
-            return _handle_pdf(resp.content)
-        text = _parse_html(resp.text)
-        if len(text) > 50:
-            return text
-        return None
+        entry = _fetch_entry(url)
+        if entry is None:
+            return None
+        # Parsed text is keyed by content hash, so a 304 or a duplicate URL skips parsing too.
+        cached = cache_get("parsed", entry["hash"], MAX_TEXT_CHARS)
+        if cached is not None:
+            return cached or None
+        content = get_blob(entry["hash"])
+        if content is None:
+            return None
+        text = parse_content(content, entry.get("content_type", ""))
+        cache_set("parsed", text or "", entry["hash"], MAX_TEXT_CHARS)
+        return text
     except Exception:
         return None
 
 
-def _parse_html(html: str) -> str:
+def fetch_raw(url: str) -> tuple[bytes, str] | None:
+    """Raw body and content type, revalidated with the origin once the stored copy goes stale."""
+    entry = _fetch_entry(url)
+    if entry is None:
+        return None
+    content = get_blob(entry["hash"])
+    if content is None:
+        return None
+    return content, entry.get("content_type", "")
+
+
+def _fetch_entry(url: str) -> dict | None:
+    entry = lookup_url(url)
+    have_body = entry is not None and has_blob(entry["hash"])
+    if have_body and (time.time() - entry["ts"]) <= entry.get("max_age", TTL_PAGE):
+        return entry
+
+    headers = dict(HEADERS)
+    if have_body:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    resp = requests.get(url, timeout=FETCH_TIMEOUT, headers=headers, allow_redirects=True)
+    if resp.status_code == 304 and have_body:
+        return touch_url(url, **_validators(resp.headers, entry))
+    resp.raise_for_status()
+    return store_url(url, resp.content, resp.headers.get("Content-Type", ""), **_validators(resp.headers))
+
+
+def _validators(headers, previous: dict | None = None) -> dict:
+    """ETag / Last-Modified / max-age from a response, falling back to the stored ones on a 304."""
+    previous = previous or {}
+    validators = {
+        "etag": headers.get("ETag") or previous.get("etag"),
+        "last_modified": headers.get("Last-Modified") or previous.get("last_modified"),
+    }
+    cache_control = headers.get("Cache-Control", "").lower()
+    max_age = re.search(r"max-age=(\d+)", cache_control)
+    if "no-cache" in cache_control or "no-store" in cache_control:
+        validators["max_age"] = 0
+    elif max_age:
+        validators["max_age"] = int(max_age.group(1))
+    elif "max_age" in previous:
+        validators["max_age"] = previous["max_age"]
+    return validators
+
+
+def reparse_page(url: str) -> str | None:
+    """Re-run parsing on the stored body of a URL without going to the network."""
+    stored = load_url(url)
+    if stored is None:
+        return None
+    return parse_content(*stored)
+
+
+def parse_content(content: bytes, content_type: str) -> str | None:
+    if "pdf" in content_type.lower():
+        return _handle_pdf(content)
+    text = _parse_html(content)
+    if len(text) > 50:
+        return text
+    return None
+
+
+def _parse_html(html: str | bytes) -> str:
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
     for tag in soup(["script", "style", "nav", "footer", "header", "aside", "noscript"]):
         tag.decompose()
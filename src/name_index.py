@@ -0,0 +1,131 @@
+import bisect
+import difflib
+import heapq
+import re
+import sys
+from collections import Counter
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "", str(name).upper())
+
+
+def _grams(name: str, q: int = 3) -> set:
+    s = _normalize(name)
+    if not s:
+        return set()
+    padded = f"{'^' * (q - 1)}{s}$"
+    return {sys.intern(padded[i : i + q]) for i in range(len(padded) - q + 1)}
+
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to product names. Candidates are ranked
+    by trigram Dice overlap, and difflib similarity is computed only for a shortlist.
+    """
+
+    def __init__(self, q: int = 3):
+        self.q = q
+        self._postings = {}
+        self._sizes = {}
+        self._names = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, key: str, name: str):
+        if key in self._names:
+            self.remove(key)
+        grams = _grams(name, self.q)
+        self._names[key] = str(name).upper().strip()
+        self._sizes[key] = len(grams)
+        for g in grams:
+            self._postings.setdefault(g, set()).add(key)
+
+    def remove(self, key: str):
+        if key not in self._names:
+            return
+        del self._sizes[key]
+        for g in _grams(self._names.pop(key), self.q):
+            posting = self._postings.get(g)
+            if posting is not None:
+                posting.discard(key)
+                if not posting:
+                    del self._postings[g]
+
+    def _overlap(self, name: str) -> tuple[str, dict]:
+        query = str(name or "").upper().strip()
+        grams = _grams(query, self.q)
+        shared = Counter()
+        for g in grams:
+            shared.update(self._postings.get(g, ()))
+        n = len(grams)
+        dice = {key: 2.0 * count / (n + self._sizes[key]) for key, count in shared.items()}
+        return query, dice
+
+    def search(self, name: str, k: int = 5, shortlist: int = 20) -> list[tuple[str, str, float]]:
+        """Top-k (key, name, similarity) by difflib ratio, re-scoring only the best `shortlist` by overlap."""
+        query, dice = self._overlap(name)
+        if not query:
+            return []
+        best = heapq.nlargest(max(k, shortlist), dice, key=dice.get)
+        scored = [
+            (key, self._names[key], difflib.SequenceMatcher(None, query, self._names[key]).ratio())
+            for key in best
+        ]
+        scored.sort(key=lambda item: item[2], reverse=True)
+        return scored[:k]
+
+    def scores(self, name: str, shortlist: int = 20) -> dict:
+        """
+        Similarity per indexed name: exact difflib ratio for the shortlist, trigram Dice
+        for the rest, and absent (treat as 0) when no trigram is shared.
+        """
+        query, dice = self._overlap(name)
+        result = {self._names[key]: score for key, score in dice.items()}
+        if not query:
+            return result
+        for key in heapq.nlargest(shortlist, dice, key=dice.get):
+            result[self._names[key]] = difflib.SequenceMatcher(None, query, self._names[key]).ratio()
+        return result
+
+
+class PrefixIndex:
+    """
+    Sorted array of (normalized name, key) pairs. All names starting with a prefix form one
+    contiguous slice, found by bisection, so a lookup costs O(log n + results).
+    """
+
+    def __init__(self, items=()):
+        self._tokens = {key: _normalize(name) for key, name in items}
+        self._entries = sorted((token, key) for key, token in self._tokens.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key: str, name: str):
+        self.remove(key)
+        token = _normalize(name)
+        self._tokens[key] = token
+        bisect.insort(self._entries, (token, key))
+
+    def remove(self, key: str):
+        token = self._tokens.pop(key, None)
+        if token is None:
+            return
+        i = bisect.bisect_left(self._entries, (token, key))
+        if i < len(self._entries) and self._entries[i] == (token, key):
+            del self._entries[i]
+
+    def search(self, prefix: str, limit: int = 10) -> list[str]:
+        """Keys whose normalized name starts with the normalized prefix, in name order."""
+        prefix = _normalize(prefix)
+        keys = []
+        i = bisect.bisect_left(self._entries, (prefix, ""))
+        while i < len(self._entries) and len(keys) < limit:
+            token, key = self._entries[i]
+            if not token.startswith(prefix):
+                break
+            keys.append(key)
+            i += 1
+        return keys
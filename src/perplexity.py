@@ -1,7 +1,21 @@
+import asyncio
 import json
 import re
-from openai import OpenAI
-from src.config import PERPLEXITY_API_KEY, PERPLEXITY_MODEL
+import threading
+import time
+import weakref
+from src.config import (
+    PERPLEXITY_API_KEY,
+    PERPLEXITY_MODEL,
+    PERPLEXITY_MAX_CONCURRENCY,
+    PERPLEXITY_KEEPALIVE,
+    PERPLEXITY_BATCH_SIZE,
+    PERPLEXITY_RATE_LIMIT,
+    PERPLEXITY_MAX_RETRIES,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+from src.resilience import ApiGuard, CircuitBreaker, TokenBucket, guard_for, http_status, is_retryable_status
 
 SYSTEM_PROMPT = """You are a pump specification lookup tool. When given a pump manufacturer and model, search for its technical specs.
 
@@ -39,6 +53,17 @@ USER_PROMPT = """Find the pump specifications for: {manufacturer} {prodname}
 
 Return ONLY the JSON with raw values, units, and types."""
 
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+
+BATCH MODE: you are given several numbered pumps. Instead of a single object, return ONLY a JSON
+array with one object per pump, in the same order. Each object has the fields above plus
+"id": the pump's number. Never skip a pump; use "unknown" for anything you cannot find."""
+
+BATCH_USER_PROMPT = """Find the pump specifications for each of these pumps:
+{pumps}
+
+Return ONLY the JSON array with raw values, units, and types."""
+
 QA_SYSTEM_PROMPT = """You are a pump expert. Given a pump brand and model, answer the user's question \
 in clear, practical language (3-5 sentences). Focus on:
 - What the pump is designed for (e.g., hydronic heating, domestic hot water recirculation, chilled water).
@@ -54,28 +79,344 @@ Known specs: Flow = {flow} m³/h, Head = {head} m, Phase = {phase}
 User question: {question}"""
 
 
-def extract_via_perplexity(manufacturer: str, prodname: str) -> dict:
-    if not PERPLEXITY_API_KEY:
-        raise RuntimeError("PERPLEXITY_API_KEY env var must be set")
+PERPLEXITY_BASE_URL = "https://api.perplexity.ai"
+
+# List prices per model: USD per 1M input tokens, per 1M output tokens, per 1000 requests
+# (low search context). Used for cost accounting only; unlisted models count as sonar.
+MODEL_PRICES = {
+    "sonar": (1.0, 1.0, 5.0),
+    "sonar-pro": (3.0, 15.0, 6.0),
+    "sonar-reasoning": (1.0, 5.0, 5.0),
+    "sonar-reasoning-pro": (2.0, 8.0, 6.0),
+}
 
-    client = OpenAI(
-        api_key=PERPLEXITY_API_KEY,
-        base_url="https://api.perplexity.ai",
+_client = None
+_client_lock = threading.Lock()
+# Caps in-flight requests from this process, across threads
+_sync_slots = threading.BoundedSemaphore(PERPLEXITY_MAX_CONCURRENCY)
+# Running totals for cost/latency comparisons between single and batched extraction
+_usage = {"requests": 0, "pumps": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+# The same totals per model, plus summed latency
+_model_usage = {}
+_usage_lock = threading.Lock()
+# Async client and semaphore per event loop: both are bound to the loop they first run on
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _connection_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=PERPLEXITY_MAX_CONCURRENCY,
+        max_keepalive_connections=PERPLEXITY_MAX_CONCURRENCY,
+        keepalive_expiry=PERPLEXITY_KEEPALIVE,
     )
 
-    response = client.chat.completions.create(
-        model=PERPLEXITY_MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": USER_PROMPT.format(manufacturer=manufacturer, prodname=prodname)},
-        ],
+
+def _get_client():
+    """Shared Perplexity client, created on first use so importing this module stays cheap."""
+    global _client
+    if not PERPLEXITY_API_KEY:
+        raise RuntimeError("PERPLEXITY_API_KEY env var must be set")
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import DefaultHttpxClient, OpenAI
+
+                _client = OpenAI(
+                    api_key=PERPLEXITY_API_KEY,
+                    base_url=PERPLEXITY_BASE_URL,
+                    http_client=DefaultHttpxClient(limits=_connection_limits()),
+                    max_retries=0,  # retries are done by _guard(), which also sees the rate limit
+                )
+    return _client
+
+
+def _get_async_client():
+    """
+    Process-wide AsyncOpenAI client (one per event loop) with a keep-alive connection pool,
+    and the semaphore that limits concurrent requests through it.
+    """
+    if not PERPLEXITY_API_KEY:
+        raise RuntimeError("PERPLEXITY_API_KEY env var must be set")
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        client = AsyncOpenAI(
+            api_key=PERPLEXITY_API_KEY,
+            base_url=PERPLEXITY_BASE_URL,
+            http_client=DefaultAsyncHttpxClient(limits=_connection_limits()),
+            max_retries=0,
+        )
+        entry = _async_clients[loop] = (client, asyncio.Semaphore(PERPLEXITY_MAX_CONCURRENCY))
+    return entry
+
+
+def _retryable(error: Exception) -> bool:
+    from openai import APIConnectionError
+
+    return isinstance(error, APIConnectionError) or is_retryable_status(http_status(error))
+
+
+def _guard() -> ApiGuard:
+    """Rate limit, retry policy and circuit breaker shared by every call made with this API key."""
+    return guard_for(
+        "perplexity",
+        PERPLEXITY_API_KEY,
+        lambda: ApiGuard(
+            "perplexity",
+            TokenBucket(PERPLEXITY_RATE_LIMIT / 60, PERPLEXITY_MAX_CONCURRENCY),
+            _retryable,
+            max_retries=PERPLEXITY_MAX_RETRIES,
+            breaker=CircuitBreaker("perplexity", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT),
+        ),
     )
 
+
+def _cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    per_input, per_output, per_thousand = MODEL_PRICES.get(model, MODEL_PRICES["sonar"])
+    return (prompt_tokens * per_input + completion_tokens * per_output) / 1e6 + per_thousand / 1000
+
+
+def _record_usage(response, pumps: int = 1, model: str = PERPLEXITY_MODEL, latency: float = 0.0):
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    cost = _cost(model, prompt_tokens, completion_tokens)
+    with _usage_lock:
+        per_model = _model_usage.setdefault(
+            model, {"requests": 0, "pumps": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "latency_s": 0.0}
+        )
+        for totals in (_usage, per_model):
+            totals["requests"] += 1
+            totals["pumps"] += pumps
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["cost_usd"] += cost
+        per_model["latency_s"] += latency
+
+
+def perplexity_usage() -> dict:
+    """
+    Requests, pumps, tokens and estimated cost sent to Perplexity by this process (single and
+    batched calls), with the same totals and summed latency per model under "models".
+    """
+    with _usage_lock:
+        usage = dict(_usage)
+        usage["models"] = {model: dict(totals) for model, totals in _model_usage.items()}
+    return usage
+
+
+def _extraction_messages(manufacturer: str, prodname: str) -> list[dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_PROMPT.format(manufacturer=manufacturer, prodname=prodname)},
+    ]
+
+
+def _question_messages(manufacturer, prodname, question, flow, head, phase) -> list[dict]:
+    return [
+        {"role": "system", "content": QA_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": QA_USER_PROMPT.format(
+                manufacturer=manufacturer,
+                prodname=prodname,
+                flow=flow,
+                head=head,
+                phase=phase,
+                question=question,
+            ),
+        },
+    ]
+
+
+def _strip_markup(text: str) -> str:
+    text = re.sub(r"\[\d+\]", "", text)
+    # Strip common markdown emphasis that shows up in answers (**, *, _, `)
+    return re.sub(r"[*_`]+", "", text)
+
+
+def _clean_answer(text: str) -> str:
+    return _strip_markup((text or "").strip()).strip()
+
+
+class _StreamCleaner:
+    """
+    _clean_answer applied to a stream of chunks. Only text that could still become a
+    citation marker ("[", "[12") or trailing whitespace is held back until the next chunk.
+    """
+
+    _PARTIAL_CITATION = re.compile(r"\[\d*$")
+
+    def __init__(self):
+        self._held = ""
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        text = self._held + (chunk or "")
+        partial = self._PARTIAL_CITATION.search(text)
+        cut = partial.start() if partial else len(text)
+        ready = _strip_markup(text[:cut])
+        body = ready.rstrip()
+        self._held = ready[len(body):] + text[cut:]
+        if not self._started:
+            body = body.lstrip()
+            self._started = bool(body)
+        return body
+
+    def flush(self) -> str:
+        text = _strip_markup(self._held).rstrip()
+        self._held = ""
+        return text if self._started else text.lstrip()
+
+
+def extract_via_perplexity(manufacturer: str, prodname: str, model: str = PERPLEXITY_MODEL) -> dict:
+    client = _get_client()
+
+    with _sync_slots:
+        start = time.perf_counter()
+        response = _guard().call(
+            client.chat.completions.create,
+            model=model,
+            messages=_extraction_messages(manufacturer, prodname),
+        )
+    _record_usage(response, model=model, latency=time.perf_counter() - start)
+
     raw = response.choices[0].message.content
     parsed = _parse_raw_response(raw)
     return _convert_to_nominal_metric(parsed)
 
 
+async def aextract_via_perplexity(manufacturer: str, prodname: str, model: str = PERPLEXITY_MODEL) -> dict:
+    """Async extract_via_perplexity: awaits the shared async client instead of blocking a thread."""
+    client, slots = _get_async_client()
+
+    async with slots:
+        start = time.perf_counter()
+        response = await _guard().acall(
+            client.chat.completions.create,
+            model=model,
+            messages=_extraction_messages(manufacturer, prodname),
+        )
+    _record_usage(response, model=model, latency=time.perf_counter() - start)
+
+    raw = response.choices[0].message.content
+    parsed = _parse_raw_response(raw)
+    return _convert_to_nominal_metric(parsed)
+
+
+def _batch_messages(pumps: list[tuple[str, str]]) -> list[dict]:
+    listing = "\n".join(f"{i}. {manufacturer} {prodname}" for i, (manufacturer, prodname) in enumerate(pumps, 1))
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": BATCH_USER_PROMPT.format(pumps=listing)},
+    ]
+
+
+def _batches(pumps: list[tuple[str, str]], batch_size: int) -> list[list[int]]:
+    """
+    Index groups of at most batch_size, one manufacturer per batch where possible; the
+    leftovers of each manufacturer are packed together rather than sent as tiny batches.
+    """
+    by_manufacturer = {}
+    for i, (manufacturer, _) in enumerate(pumps):
+        by_manufacturer.setdefault(str(manufacturer).upper().strip(), []).append(i)
+    batches, leftovers = [], []
+    for indices in by_manufacturer.values():
+        full = len(indices) - len(indices) % batch_size
+        batches += [indices[j : j + batch_size] for j in range(0, full, batch_size)]
+        leftovers += indices[full:]
+    batches += [leftovers[j : j + batch_size] for j in range(0, len(leftovers), batch_size)]
+    return batches
+
+
+def _unknown(error: Exception) -> dict:
+    return {"FLOWNOM56": "unknown", "HEADNOM56": "unknown", "PHASE": "unknown", "_error": str(error)}
+
+
+def extract_batch_via_perplexity(
+    pumps: list[tuple[str, str]], batch_size: int = PERPLEXITY_BATCH_SIZE, model: str = PERPLEXITY_MODEL
+) -> list[dict]:
+    """
+    extract_via_perplexity for many (manufacturer, prodname) pairs, several pumps per request.
+    Results come back in input order. Pumps missing from a batch answer are retried one by
+    one; a pump that still fails gets "unknown" fields with an "_error".
+    """
+    client = _get_client()
+    results = [None] * len(pumps)
+    for batch in _batches(pumps, max(1, batch_size)):
+        try:
+            with _sync_slots:
+                start = time.perf_counter()
+                response = _guard().call(
+                    client.chat.completions.create,
+                    model=model,
+                    messages=_batch_messages([pumps[i] for i in batch]),
+                )
+            _record_usage(response, len(batch), model, time.perf_counter() - start)
+            items = _parse_raw_array(response.choices[0].message.content, len(batch))
+        except Exception as e:
+            print(f"Batch extraction failed, retrying pumps individually: {e}")
+            items = [None] * len(batch)
+        for i, item in zip(batch, items):
+            if item is not None:
+                results[i] = _convert_to_nominal_metric(item)
+
+    for i, result in enumerate(results):
+        if result is None:
+            try:
+                results[i] = extract_via_perplexity(*pumps[i], model=model)
+            except Exception as e:
+                results[i] = _unknown(e)
+    return results
+
+
+async def aextract_batch_via_perplexity(
+    pumps: list[tuple[str, str]], batch_size: int = PERPLEXITY_BATCH_SIZE, model: str = PERPLEXITY_MODEL
+) -> list[dict]:
+    """Async extract_batch_via_perplexity: batches run concurrently, up to the client's concurrency limit."""
+    client, slots = _get_async_client()
+
+    async def _run(batch: list[int]) -> list[dict | None]:
+        try:
+            async with slots:
+                start = time.perf_counter()
+                response = await _guard().acall(
+                    client.chat.completions.create,
+                    model=model,
+                    messages=_batch_messages([pumps[i] for i in batch]),
+                )
+            _record_usage(response, len(batch), model, time.perf_counter() - start)
+            return _parse_raw_array(response.choices[0].message.content, len(batch))
+        except Exception as e:
+            print(f"Batch extraction failed, retrying pumps individually: {e}")
+            return [None] * len(batch)
+
+    async def _single(i: int) -> dict:
+        try:
+            return await aextract_via_perplexity(*pumps[i], model=model)
+        except Exception as e:
+            return _unknown(e)
+
+    batches = _batches(pumps, max(1, batch_size))
+    results = [None] * len(pumps)
+    for batch, items in zip(batches, await asyncio.gather(*(_run(b) for b in batches))):
+        for i, item in zip(batch, items):
+            if item is not None:
+                results[i] = _convert_to_nominal_metric(item)
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    for i, result in zip(missing, await asyncio.gather(*(_single(i) for i in missing))):
+        results[i] = result
+    return results
+
+
+EXPECTED_KEYS = {"flow_value", "flow_unit", "flow_type", "head_value", "head_unit", "head_type", "phase"}
+
+
 def _parse_raw_response(raw: str) -> dict:
     text = (raw or "").strip()
     if not text:
@@ -99,16 +440,57 @@ def _parse_raw_response(raw: str) -> dict:
         except json.JSONDecodeError:
             pass
 
-    # 3) Fallback: try each JSON-looking object and pick one with expected keys.
-    expected_keys = {"flow_value", "flow_unit", "flow_type", "head_value", "head_unit", "head_type", "phase"}
-    for candidate in re.findall(r"\{[\s\S]*?\}", text):
+    # 3) Fallback: try each JSON object in the text and pick one with expected keys.
+    for obj in _json_values(text, "{"):
+        if isinstance(obj, dict) and EXPECTED_KEYS.intersection(obj.keys()):
+            return obj
+    return {}
+
+
+def _parse_raw_array(raw: str, count: int) -> list[dict | None]:
+    """
+    Per-pump objects from a batch answer, matched by their "id" (else by position).
+    Pumps with no usable object come back as None.
+    """
+    text = (raw or "").strip()
+    items = None
+    for value in _json_values(text, "["):
+        if isinstance(value, list) and any(isinstance(v, dict) for v in value):
+            items = value
+            break
+    if items is None:
+        # No complete array (e.g. the answer was cut off): salvage the complete objects.
+        items = [v for v in _json_values(text, "{") if isinstance(v, dict)]
+
+    results = [None] * count
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not EXPECTED_KEYS.intersection(item.keys()):
+            continue
         try:
-            obj = json.loads(candidate)
-            if isinstance(obj, dict) and expected_keys.intersection(obj.keys()):
-                return obj
+            index = int(item.get("id")) - 1
+        except (TypeError, ValueError):
+            index = position
+        if 0 <= index < count and results[index] is None:
+            results[index] = item
+    return results
+
+
+def _json_values(text: str, opener: str):
+    """
+    Yield each JSON value in `text` that starts with `opener` ("{" or "[") and decodes
+    cleanly, scanning left to right. Unlike a regex this copes with nesting and with
+    braces inside strings.
+    """
+    decoder = json.JSONDecoder()
+    i = text.find(opener)
+    while i != -1:
+        try:
+            value, end = decoder.raw_decode(text, i)
         except json.JSONDecodeError:
+            i = text.find(opener, i + 1)
             continue
-    return {}
+        yield value
+        i = text.find(opener, end)
 
 
 def _convert_to_nominal_metric(data: dict) -> dict:
@@ -226,33 +608,62 @@ def answer_pump_question(
     phase: str = "unknown",
 ) -> str:
     """Ask Perplexity a free-form question about a specific pump."""
-    if not PERPLEXITY_API_KEY:
-        raise RuntimeError("PERPLEXITY_API_KEY env var must be set")
+    client = _get_client()
 
-    client = OpenAI(
-        api_key=PERPLEXITY_API_KEY,
-        base_url="https://api.perplexity.ai",
-    )
+    with _sync_slots:
+        response = _guard().call(
+            client.chat.completions.create,
+            model=PERPLEXITY_MODEL,
+            messages=_question_messages(manufacturer, prodname, question, flow, head, phase),
+        )
+    return _clean_answer(response.choices[0].message.content)
 
-    response = client.chat.completions.create(
-        model=PERPLEXITY_MODEL,
-        messages=[
-            {"role": "system", "content": QA_SYSTEM_PROMPT},
-            {
-                "role": "user",
-                "content": QA_USER_PROMPT.format(
-                    manufacturer=manufacturer,
-                    prodname=prodname,
-                    flow=flow,
-                    head=head,
-                    phase=phase,
-                    question=question,
-                ),
-            },
-        ],
-    )
-    text = response.choices[0].message.content.strip()
-    text = re.sub(r"\[\d+\]", "", text)
-    # Strip common markdown emphasis that shows up in answers (**, *, _, `)
-    text = re.sub(r"[*_`]+", "", text)
-    return text.strip()
+
+async def aanswer_pump_question(
+    manufacturer: str,
+    prodname: str,
+    question: str,
+    flow: str = "unknown",
+    head: str = "unknown",
+    phase: str = "unknown",
+) -> str:
+    """Async answer_pump_question."""
+    client, slots = _get_async_client()
+
+    async with slots:
+        response = await _guard().acall(
+            client.chat.completions.create,
+            model=PERPLEXITY_MODEL,
+            messages=_question_messages(manufacturer, prodname, question, flow, head, phase),
+        )
+    return _clean_answer(response.choices[0].message.content)
+
+
+async def astream_pump_question(
+    manufacturer: str,
+    prodname: str,
+    question: str,
+    flow: str = "unknown",
+    head: str = "unknown",
+    phase: str = "unknown",
+):
+    """answer_pump_question as an async stream of cleaned text chunks, yielded as tokens arrive."""
+    client, slots = _get_async_client()
+    cleaner = _StreamCleaner()
+
+    async with slots:
+        stream = await _guard().acall(
+            client.chat.completions.create,
+            model=PERPLEXITY_MODEL,
+            messages=_question_messages(manufacturer, prodname, question, flow, head, phase),
+            stream=True,
+        )
+        async for event in stream:
+            if not event.choices:
+                continue
+            text = cleaner.feed(event.choices[0].delta.content or "")
+            if text:
+                yield text
+    tail = cleaner.flush()
+    if tail:
+        yield tail
@@ -1,8 +1,19 @@
 import os
+import sys
 import json
 import re
-from src.config import DATA_DIR
+import time
+import sqlite3
+import threading
+import zlib
+from collections.abc import Mapping
+import numpy as np
+from src.config import DATA_DIR, CATALOG_WATCH_INTERVAL
 from src.normalizer import normalize_phase
+from src.name_index import PrefixIndex, TrigramIndex
+from src.duty_index import DutyPointIndex
+from src.record_store import PumpRecord, RecordStore, numeric_column
+from src.catalog_snapshot import CATALOG_SNAPSHOT_FILE, load_snapshot, read_catalog_rows, snapshot_source
 
 # 1. The file you provided (Read-Only)
 SOURCE_DB_FILE = os.path.join(DATA_DIR, "pump_discoveries.json")
@@ -11,9 +22,288 @@ SOURCE_DB_FILE = os.path.join(DATA_DIR, "pump_discoveries.json")
 # This prevents corrupting your original source file
 CACHE_DB_FILE = os.path.join(DATA_DIR, "pump_discoveries.json")
 
+# 3. Discoveries shared by every worker process (SQLite, WAL mode)
+DISCOVERIES_DB_FILE = os.path.join(DATA_DIR, "pump_discoveries.sqlite3")
+DISCOVERY_POLL_INTERVAL = 1.0
+
+# Older discovery journal, imported into the store on first run
+JOURNAL_FILE = os.path.join(DATA_DIR, "pump_discoveries.jsonl")
+SNAPSHOT_FILE = os.path.join(DATA_DIR, "pump_discoveries.snapshot.json")
+
+
+class DiscoveryStore:
+    """
+    Discoveries in a SQLite file shared by all workers. Every write is atomic and gets a
+    new sequence number, so each process catches up on other workers' discoveries by
+    reading only the rows past the last sequence number it has seen.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or DISCOVERIES_DB_FILE
+        self.seq = 0
+        # Sequence numbers this process wrote (and so already applied), skipped by changes()
+        self._written = set()
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not cross a fork, so each worker process opens its own.
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # AUTOINCREMENT: sequence numbers are never reused, even after a replace.
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS discoveries "
+                "(seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL UNIQUE, entry TEXT NOT NULL, ts REAL)"
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def load(self) -> dict:
+        """Every stored discovery, key -> entry (imports the old journal on first run)."""
+        with self._lock:
+            conn = self._connection()
+            if conn.execute("SELECT 1 FROM discoveries LIMIT 1").fetchone() is None:
+                self._import_journal(conn)
+        return dict(self.changes())
+
+    def changes(self) -> list[tuple[str, dict]]:
+        """Discoveries written by other processes since the last call, oldest first."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT seq, key, entry FROM discoveries WHERE seq > ? ORDER BY seq", (self.seq,)
+            ).fetchall()
+            if rows:
+                self.seq = rows[-1][0]
+            rows = [row for row in rows if row[0] not in self._written]
+            self._written = {seq for seq in self._written if seq > self.seq}
+        return [(key, json.loads(entry)) for _, key, entry in rows]
+
+    def put(self, key: str, entry: dict) -> int:
+        """Store a discovery this process has already applied; returns its sequence number."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                seq = conn.execute(
+                    "INSERT OR REPLACE INTO discoveries (key, entry, ts) VALUES (?, ?, ?)",
+                    (key, json.dumps(entry), time.time()),
+                ).lastrowid
+            self._written.add(seq)
+        return seq
+
+    def _import_journal(self, conn: sqlite3.Connection):
+        entries = {}
+        if os.path.exists(SNAPSHOT_FILE):
+            try:
+                with open(SNAPSHOT_FILE, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading discoveries snapshot: {e}")
+        if os.path.exists(JOURNAL_FILE):
+            with open(JOURNAL_FILE, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A crash mid-append can leave a partial last line.
+                        break
+                    entries[record["key"]] = record["entry"]
+        if entries:
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO discoveries (key, entry, ts) VALUES (?, ?, ?)",
+                    [(key, json.dumps(entry), time.time()) for key, entry in entries.items()],
+                )
+
+def char_counts(text: str) -> np.ndarray:
+    """Per-character counts over printable ASCII (anything else shares the last slot)."""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64) - 32
+    codes[(codes < 0) | (codes > 94)] = 95
+    return np.bincount(codes, minlength=96).astype(np.int16)
+
+
+# Bucket maps of a catalog, in the order of a record's (manufacturer, family, phase) placement
+_BUCKETS = ("by_manufacturer", "by_family", "by_phase")
+# Average entries per shard of a _ShardedMap before it doubles its shard count
+_SHARD_SIZE = 64
+
+
+class _ShardedMap(Mapping):
+    """
+    Read-only dict-like map split into shards by a stable hash of the key. copy() shares
+    every shard with the original; the copy's first write to a shard copies only that shard,
+    so a write costs about _SHARD_SIZE entries plus the shard list, not the whole map.
+    Iteration follows the shards (deterministic, but not insertion order).
+    """
+
+    __slots__ = ("_shards", "_len", "_owned")
+
+    def __init__(self):
+        self._shards = [{}]
+        self._len = 0
+        # Shards this map may change in place; None means all of them
+        self._owned = None
+
+    @staticmethod
+    def _hash(key) -> int:
+        return zlib.crc32(repr(key).encode())
+
+    def _shard(self, key) -> dict:
+        return self._shards[self._hash(key) & (len(self._shards) - 1)]
+
+    def __getitem__(self, key):
+        return self._shard(key)[key]
+
+    def get(self, key, default=None):
+        return self._shard(key).get(key, default)
+
+    def __contains__(self, key):
+        return key in self._shard(key)
+
+    def __iter__(self):
+        for shard in self._shards:
+            yield from shard
+
+    def __len__(self):
+        return self._len
+
+    def values(self):
+        return [value for shard in self._shards for value in shard.values()]
+
+    def items(self):
+        return [item for shard in self._shards for item in shard.items()]
+
+    def copy(self) -> "_ShardedMap":
+        """A successor sharing all shards; only the successor may be written from then on."""
+        other = _ShardedMap()
+        other._shards = list(self._shards)
+        other._len = self._len
+        other._owned = set()
+        return other
+
+    def _writable(self, key) -> dict:
+        i = self._hash(key) & (len(self._shards) - 1)
+        if self._owned is not None and i not in self._owned:
+            self._owned.add(i)
+            self._shards[i] = dict(self._shards[i])
+        return self._shards[i]
+
+    def __setitem__(self, key, value):
+        shard = self._writable(key)
+        if key not in shard:
+            self._len += 1
+        shard[key] = value
+        if self._len > 2 * _SHARD_SIZE * len(self._shards):
+            self._reshard(2 * len(self._shards))
+
+    def pop(self, key, default=None):
+        shard = self._shard(key)
+        if key not in shard:
+            return default
+        self._len -= 1
+        return self._writable(key).pop(key)
+
+    def _reshard(self, count: int):
+        """Spread the entries over `count` new shards (doubling keeps this amortized constant per write)."""
+        shards = [{} for _ in range(count)]
+        for shard in self._shards:
+            for key, value in shard.items():
+                shards[self._hash(key) & (count - 1)][key] = value
+        self._shards = shards
+        self._owned = None
+
+
+class _Catalog:
+    """
+    One published version of the dictionary: key -> record view, the bucket maps and the
+    per-manufacturer column arrays. Never modified once published, so a reader that takes
+    the current catalog once sees one consistent version throughout. A write edits a
+    successor that shares every view and every bucket it does not touch.
+    """
+
+    def __init__(self):
+        self.rows = _ShardedMap()
+        # Secondary indexes: bucket -> {key: record view}, both levels _ShardedMaps
+        self.by_manufacturer = _ShardedMap()
+        self.by_family = _ShardedMap()
+        self.by_phase = _ShardedMap()
+        # Per-manufacturer NumPy column arrays, built on first use
+        self.columns = {}
+        # While editing: buckets already copied from the predecessor, so safe to change
+        self._owned = set()
+
+    def edit(self) -> "_Catalog":
+        """An unpublished successor sharing every map; each is copied a shard at a time as it is written."""
+        catalog = _Catalog()
+        catalog.rows = self.rows.copy()
+        catalog.by_manufacturer = self.by_manufacturer.copy()
+        catalog.by_family = self.by_family.copy()
+        catalog.by_phase = self.by_phase.copy()
+        catalog.columns = dict(self.columns)
+        return catalog
+
+    def _bucket(self, index: str, name) -> dict:
+        buckets = getattr(self, index)
+        if (index, name) not in self._owned:
+            self._owned.add((index, name))
+            bucket = buckets.get(name)
+            buckets[name] = _ShardedMap() if bucket is None else bucket.copy()
+        return buckets[name]
+
+    def move(self, key: str, view, old: tuple | None, new: tuple | None):
+        """
+        Move `key` from its `old` (manufacturer, (manufacturer, family), phase) buckets to `new` ones with
+        `view` as its record; `new` None removes it. Only before the catalog is published.
+        A key that stays in a bucket keeps its position there.
+        """
+        for i, index in enumerate(_BUCKETS):
+            if old is not None and (new is None or old[i] != new[i]):
+                self._bucket(index, old[i]).pop(key, None)
+            if new is not None:
+                self._bucket(index, new[i])[key] = view
+        for placement in (old, new):
+            if placement is not None:
+                self.columns.pop(placement[0], None)
+        if new is None:
+            self.rows.pop(key, None)
+        else:
+            self.rows[key] = view
+
+    def publish(self) -> "_Catalog":
+        self._owned = set()
+        return self
+
+
 class PumpDictionary:
     def __init__(self):
-        self.data = {}
+        # The current catalog; replaced as a whole, never changed in place
+        self._catalog = _Catalog()
+        # Catalogue rows by key from the last (re)load; discoveries shadow some of them
+        self._source = {}
+        self._source_version = None
+        # Keys with a saved discovery; those override the catalogue row
+        self._discovered = set()
+        # Every served row lives in this append-only store. Rows are never rewritten, so
+        # views already handed out never change; the store is compacted once mostly dead.
+        self._store = RecordStore()
+        self._compact_check = 0
+        # Derived indexes shared by all catalog versions and updated per changed key. They
+        # and the swap of _catalog are guarded by _index_lock, so they always match it.
+        # Per-manufacturer trigram index over product names, built on first fuzzy lookup
+        self._names = {}
+        # Sorted product-name prefix indexes for autocomplete: per manufacturer, and None for all
+        self._prefixes = {}
+        # Flow/head grid for duty-point search, built on first use
+        self._duty = None
+        self._index_lock = threading.RLock()
+        self._discoveries = DiscoveryStore()
+        self._next_poll = 0.0
+        self._poll_lock = threading.Lock()
+        self._write_lock = threading.Lock()
         self._load_source()
         self._load_cache()
 
@@ -26,14 +316,294 @@ class PumpDictionary:
     def _make_key(cls, manufacturer: str, prodname: str) -> str:
         return f"{cls._normalize_token(manufacturer)}_{cls._normalize_token(prodname)}"
 
-    def _load_source(self):
-        """Loads the tableConvert.com file. Handles 'List of Rows' format."""
-        if not os.path.exists(SOURCE_DB_FILE):
+    @staticmethod
+    def _family(prodname: str) -> str:
+        """Product family: the leading alphanumeric run, e.g. '0014' for '0014-SF1'."""
+        m = re.match(r"[A-Z0-9]+", str(prodname).upper().strip())
+        return m.group(0) if m else ""
+
+    @classmethod
+    def _placement(cls, record) -> tuple | None:
+        """The (manufacturer, family, phase) buckets a record belongs in; families are per manufacturer."""
+        if record is None:
+            return None
+        manufacturer = cls._normalize_token(record["MANUFACTURER"])
+        return manufacturer, (manufacturer, sys.intern(cls._family(record["PRODNAME"]))), record["PHASE"]
+
+    def _append(self, record) -> PumpRecord:
+        return self._store.view(self._store.append(record))
+
+    def _write(self, changes: dict):
+        """
+        Publish a catalog with `changes` (key -> view, or None to remove) applied. Only the
+        changed rows and the buckets they touch are copied; the derived indexes are updated
+        for the changed keys. Callers hold the write lock.
+        """
+        current = self._catalog
+        catalog = current.edit()
+        for key, view in changes.items():
+            catalog.move(key, view, self._placement(current.rows.get(key)), self._placement(view))
+        with self._index_lock:
+            self._catalog = catalog.publish()
+            for key, view in changes.items():
+                self._reindex(key, current.rows.get(key), view)
+        self._maybe_compact()
+
+    def _reindex(self, key: str, old, view):
+        if old is not None:
+            manufacturer = self._normalize_token(old["MANUFACTURER"])
+            if manufacturer in self._names:
+                self._names[manufacturer].remove(key)
+            for bucket in (manufacturer, None):
+                if bucket in self._prefixes:
+                    self._prefixes[bucket].remove(key)
+            if self._duty is not None:
+                self._duty.remove(key)
+        if view is not None:
+            manufacturer = self._normalize_token(view["MANUFACTURER"])
+            if manufacturer in self._names:
+                self._names[manufacturer].add(key, view["PRODNAME"])
+            for bucket in (manufacturer, None):
+                if bucket in self._prefixes:
+                    self._prefixes[bucket].add(key, view["PRODNAME"])
+            if self._duty is not None:
+                self._add_duty_point(self._duty, key, view)
+
+    def _maybe_compact(self):
+        """
+        Copy the live rows into a fresh store once replaced and removed rows make up most of
+        the old one. Checked each time the store doubles, so the cost stays constant per write.
+        """
+        if len(self._store) < self._compact_check:
+            return
+        current = self._catalog
+        live = {id(view) for view in current.rows.values()} | {id(view) for view in self._source.values()}
+        self._compact_check = 2 * max(len(self._store), 1024)
+        if 2 * len(live) > len(self._store):
             return
+        store = RecordStore()
+        moved = {}
+
+        def _move(view):
+            if id(view) not in moved:
+                moved[id(view)] = store.view(store.append(view))
+            return moved[id(view)]
+
+        catalog = _Catalog()
+        for key, view in current.rows.items():
+            catalog.move(key, _move(view), None, self._placement(view))
+        self._source = {key: _move(view) for key, view in self._source.items()}
+        # Keys, names and duty points are unchanged, so the derived indexes stay as they are.
+        with self._index_lock:
+            self._catalog = catalog.publish()
+        self._store = store
+        self._compact_check = 2 * max(len(store), 1024)
+
+    def _prefix_index(self, manufacturer: str | None) -> PrefixIndex:
+        """Callers hold the index lock."""
+        bucket = self._normalize_token(manufacturer) if manufacturer else None
+        index = self._prefixes.get(bucket)
+        if index is None:
+            catalog = self._catalog
+            records = catalog.rows if bucket is None else catalog.by_manufacturer.get(bucket, {})
+            index = self._prefixes[bucket] = PrefixIndex((key, r["PRODNAME"]) for key, r in records.items())
+        return index
+
+    def suggest(self, prefix: str, manufacturer: str | None = None, limit: int = 10) -> list[dict]:
+        """Autocomplete: catalogue pumps whose product name starts with `prefix` (punctuation ignored)."""
+        self._poll()
+        with self._index_lock:
+            catalog = self._catalog
+            keys = self._prefix_index(manufacturer).search(prefix, limit=limit)
+        return [catalog.rows[key] for key in keys]
+
+    def _add_duty_point(self, index: DutyPointIndex, key: str, record):
+        flow, head = record["FLOWNOM56"], record["HEADNOM56"]
+        if flow != "unknown" and head != "unknown":
+            manufacturer = self._normalize_token(record["MANUFACTURER"])
+            index.add(key, manufacturer, record["PHASE"], flow, head)
+
+    def _duty_index(self) -> DutyPointIndex:
+        """Callers hold the index lock."""
+        if self._duty is None:
+            index = DutyPointIndex()
+            for key, record in self._catalog.rows.items():
+                self._add_duty_point(index, key, record)
+            self._duty = index
+        return self._duty
+
+    def _duty_filters(self, phase, manufacturer) -> tuple:
+        phase = None if phase in (None, "") else normalize_phase(phase)
+        manufacturer = self._normalize_token(manufacturer) if manufacturer else None
+        return phase, manufacturer
+
+    def nearest_duty(
+        self,
+        flow: float,
+        head: float,
+        phase=None,
+        manufacturer: str | None = None,
+        k: int = 10,
+        max_distance: float | None = None,
+    ) -> list[tuple[dict, float]]:
+        """The k pumps closest to a duty point, optionally of one phase and/or manufacturer, with distances."""
+        self._poll()
+        phase, manufacturer = self._duty_filters(phase, manufacturer)
+        with self._index_lock:
+            catalog = self._catalog
+            hits = self._duty_index().nearest(
+                flow, head, k=k, manufacturer=manufacturer, phase=phase, max_distance=max_distance
+            )
+        return [(catalog.rows[key], d) for key, d in hits]
+
+    def in_duty_range(
+        self,
+        flow_min: float,
+        flow_max: float,
+        head_min: float,
+        head_max: float,
+        phase=None,
+        manufacturer: str | None = None,
+    ) -> list[dict]:
+        """Pumps whose nominal flow and head both fall inside the given ranges."""
+        self._poll()
+        phase, manufacturer = self._duty_filters(phase, manufacturer)
+        with self._index_lock:
+            catalog = self._catalog
+            keys = self._duty_index().range(
+                flow_min, flow_max, head_min, head_max, manufacturer=manufacturer, phase=phase
+            )
+        return [catalog.rows[key] for key in keys]
+
+    def _name_index(self, manufacturer: str) -> TrigramIndex:
+        """Callers hold the index lock."""
+        manufacturer = self._normalize_token(manufacturer)
+        index = self._names.get(manufacturer)
+        if index is None:
+            index = TrigramIndex()
+            for key, record in self._catalog.by_manufacturer.get(manufacturer, {}).items():
+                index.add(key, record["PRODNAME"])
+            self._names[manufacturer] = index
+        return index
+
+    def by_manufacturer(self, manufacturer: str):
+        """Records for one manufacturer in the current version."""
+        self._poll()
+        return self._catalog.by_manufacturer.get(self._normalize_token(manufacturer), {}).values()
+
+    def by_family(self, manufacturer: str, prodname: str):
+        """Records sharing the product family of `prodname` within a manufacturer."""
+        self._poll()
+        bucket = (self._normalize_token(manufacturer), self._family(prodname))
+        return self._catalog.by_family.get(bucket, {}).values()
+
+    def by_phase(self, phase):
+        self._poll()
+        return self._catalog.by_phase.get(normalize_phase(phase), {}).values()
+
+    def columns(self, manufacturer: str) -> dict:
+        """
+        A manufacturer's records as parallel arrays: FLOWNOM56/HEADNOM56/PHASE as float64
+        with NaN for unknown, upper-cased names, and the records themselves in the same order.
+        """
+        self._poll()
+        catalog = self._catalog
+        manufacturer = self._normalize_token(manufacturer)
+        cols = catalog.columns.get(manufacturer)
+        if cols is None:
+            records = tuple(catalog.by_manufacturer.get(manufacturer, {}).values())
+            names = [r["PRODNAME"].upper().strip() for r in records]
+            positions = {}
+            for i, name in enumerate(names):
+                positions.setdefault(name, []).append(i)
+            cols = {
+                "records": records,
+                "names": names,
+                "positions": positions,
+                "lengths": np.array([len(n) for n in names], dtype=np.int32),
+                "char_counts": (
+                    np.vstack([char_counts(n) for n in names]) if names else np.zeros((0, 96), dtype=np.int16)
+                ),
+            }
+            for field in ("FLOWNOM56", "HEADNOM56", "PHASE"):
+                cols[field] = numeric_column(records, field)
+            catalog.columns[manufacturer] = cols
+        return cols
+
+    def similar(self, manufacturer: str, prodname: str, k: int = 5) -> list[tuple[dict, float]]:
+        """'Did you mean' lookup: the k closest product names of a manufacturer, with scores."""
+        self._poll()
+        with self._index_lock:
+            catalog = self._catalog
+            hits = self._name_index(manufacturer).search(prodname, k=k)
+        return [(catalog.rows[key], score) for key, _, score in hits]
+
+    def name_scores(self, manufacturer: str, prodname: str) -> dict:
+        """Name similarity per upper-cased PRODNAME of a manufacturer (see TrigramIndex.scores)."""
+        self._poll()
+        with self._index_lock:
+            return self._name_index(manufacturer).scores(prodname)
+
+    @staticmethod
+    def _snapshot_rows(snapshot: dict, store: RecordStore) -> dict:
+        """Catalogue rows from a prebuilt snapshot, bulk-loaded into `store`: key -> (view, *placement)."""
+        manufacturers = snapshot["manufacturers"]
+        tokens = snapshot["manufacturer_tokens"]
+        mfr_ids = snapshot["mfr_ids"].tolist()
+        phases = snapshot["phase"].tolist()
+        rows = store.extend(
+            [manufacturers[i] for i in mfr_ids],
+            snapshot["prodnames"],
+            "local_database",
+            snapshot["flow"],
+            snapshot["head"],
+            snapshot["phase"],
+        )
+        entries = {}
+        for i, (row, key, family) in enumerate(zip(rows, snapshot["keys"], snapshot["families"])):
+            manufacturer = tokens[mfr_ids[i]]
+            entries[key] = (store.view(row), manufacturer, (manufacturer, sys.intern(family)), phases[i] or "unknown")
+        return entries
+
+    def _record_rows(self, records: dict, store: RecordStore) -> dict:
+        """Catalogue rows from parsed source records, appended to `store`: key -> (view, *placement)."""
+        rows = {}
+        for key, record in records.items():
+            view = store.view(store.append(record))
+            rows[key] = (view, *self._placement(view))
+        return rows
+
+    @staticmethod
+    def _source_path() -> str:
+        """The catalogue file: the one the snapshot was built from, if it still exists, else SOURCE_DB_FILE."""
+        source = snapshot_source()
+        return source if source and os.path.exists(source) else SOURCE_DB_FILE
+
+    @classmethod
+    def _source_stamp(cls) -> tuple:
+        """Catalogue path plus (mtime, size) of it and the snapshot, to tell when they have changed."""
+        source = cls._source_path()
+        stamp = [source]
+        for path in (source, CATALOG_SNAPSHOT_FILE):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _read_source(self, path: str) -> dict | None:
+        """Rows of the tableConvert.com file ('List of Rows' format) by key, or None if it can't be read."""
+        records = {}
+        if not os.path.exists(path):
+            return records
 
         try:
-            with open(SOURCE_DB_FILE, "r", encoding="utf-8") as f:
-                raw_data = json.load(f)
+            if path.lower().endswith((".xlsx", ".xls")):
+                raw_data = read_catalog_rows(path)
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    raw_data = json.load(f)
 
             # TableConvert usually exports a list of dictionaries: [{"Col1": "val", ...}, ...]
             if isinstance(raw_data, list):
@@ -44,11 +614,11 @@ class PumpDictionary:
                     mfr = norm_row.get("MANUFACTURER")
                     prod = norm_row.get("PRODNAME")
                     
-                    # Only index if we have an ID
-                    if mfr and prod:
+                    # Only index if we have an ID (NaN is how Excel leaves an empty cell)
+                    if mfr and prod and mfr == mfr and prod == prod:
                         key = self._make_key(mfr, prod)
                         raw_phase = norm_row.get("PHASE", "unknown")
-                        self.data[key] = {
+                        records[key] = {
                             "MANUFACTURER": mfr,
                             "PRODNAME": prod,
                             "FLOWNOM56": norm_row.get("FLOWNOM56", "unknown"),
@@ -60,49 +630,130 @@ class PumpDictionary:
                 # Handle if the file is already a map
                 for key, val in raw_data.items():
                     val["_source"] = "local_database"
-                    self.data[key] = val
+                    records[key] = val
                     
         except Exception as e:
             print(f"Error reading source JSON: {e}")
+            return None
+        return records
+
+    def _load_source(self):
+        """Loads the catalogue snapshot if it is current, else the file it was built from (or SOURCE_DB_FILE)."""
+        self._source_version = self._source_stamp()
+        snapshot = load_snapshot()
+        if snapshot is not None:
+            rows = self._snapshot_rows(snapshot, self._store)
+        else:
+            # Stale or missing snapshot: read the catalogue it was built from.
+            rows = self._record_rows(self._read_source(self._source_version[0]) or {}, self._store)
+        catalog = _Catalog()
+        for key, (view, *placement) in rows.items():
+            catalog.move(key, view, None, tuple(placement))
+        self._source = {key: view for key, (view, *_) in rows.items()}
+        self._catalog = catalog.publish()
+        self._compact_check = 2 * max(len(self._store), 1024)
+
+    def reload_source(self) -> dict | None:
+        """
+        Hot reload: if the catalogue files changed, apply only the added, changed and removed
+        rows as one new catalog version (discoveries still take precedence). Returns the diff
+        counts, or None if nothing was reloaded.
+        """
+        stamp = self._source_stamp()
+        if stamp == self._source_version:
+            return None
+        # Parse outside the write lock into a scratch store; only changed rows are kept.
+        scratch = RecordStore()
+        snapshot = load_snapshot()
+        if snapshot is not None:
+            rows = self._snapshot_rows(snapshot, scratch)
+        else:
+            records = self._read_source(stamp[0])
+            if records is None:
+                # Unreadable, e.g. caught mid-write: keep serving the old rows and retry next time.
+                return None
+            rows = self._record_rows(records, scratch)
+
+        diff = {"added": 0, "changed": 0, "removed": 0}
+        changes = {}
+        with self._write_lock:
+            for key, (view, *_) in rows.items():
+                old = self._source.get(key)
+                if old is not None and dict(old) == dict(view):
+                    continue
+                view = self._source[key] = self._append(view)
+                if key not in self._discovered:
+                    diff["added" if old is None else "changed"] += 1
+                    changes[key] = view
+            for key in self._source.keys() - rows.keys():
+                del self._source[key]
+                if key not in self._discovered:
+                    diff["removed"] += 1
+                    changes[key] = None
+            self._source_version = stamp
+            if changes:
+                self._write(changes)
+        return diff
 
     def _load_cache(self):
         """Loads previously discovered web results."""
-        if not os.path.exists(CACHE_DB_FILE):
-            return
-        try:
-            with open(CACHE_DB_FILE, "r") as f:
-                cache_data = json.load(f)
-                # Update self.data with cache entries (overwrites source if keys collide)
-                for key, val in cache_data.items():
-                    val["_source"] = "local_database" # Cached is treated as local
-                    self.data[key] = val
-        except Exception:
-            pass
-
-    def _save_cache(self, key, entry):
-        """Appends new findings to the cache file."""
-        cache_data = {}
+        changes = {}
+        # Legacy discoveries saved as one JSON map, before the journal existed
         if os.path.exists(CACHE_DB_FILE):
             try:
                 with open(CACHE_DB_FILE, "r") as f:
                     cache_data = json.load(f)
-            except:
+                    # These override source rows if keys collide
+                    for key, val in cache_data.items():
+                        val["_source"] = "local_database" # Cached is treated as local
+                        changes[key] = self._append(val)
+            except Exception:
                 pass
-        
-        cache_data[key] = entry
-        with open(CACHE_DB_FILE, "w") as f:
-            json.dump(cache_data, f, indent=2)
+
+        for key, val in self._discoveries.load().items():
+            changes[key] = self._append(dict(val, _source="local_database"))
+        with self._write_lock:
+            self._discovered.update(changes)
+            if changes:
+                self._write(changes)
+        self._next_poll = time.monotonic() + DISCOVERY_POLL_INTERVAL
+
+    def _poll(self):
+        """Apply discoveries other workers have saved since the last poll (at most once per interval)."""
+        now = time.monotonic()
+        if now < self._next_poll or not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_poll = now + DISCOVERY_POLL_INTERVAL
+            changes = self._discoveries.changes()
+            if changes:
+                # One new catalog for the whole batch; readers never see a half-applied poll.
+                with self._write_lock:
+                    views = {key: self._append(dict(val, _source="local_database")) for key, val in changes}
+                    self._discovered.update(views)
+                    self._write(views)
+        except sqlite3.Error as e:
+            print(f"Error polling discoveries: {e}")
+        finally:
+            self._poll_lock.release()
+
+    def _save_cache(self, key, entry):
+        """Writes new findings to the shared discoveries store."""
+        return self._discoveries.put(key, entry)
 
     def get(self, manufacturer: str, prodname: str):
+        self._poll()
+        rows = self._catalog.rows
         # Primary canonical key
-        key = self._make_key(manufacturer, prodname)
-        result = self.data.get(key)
-        if result:
-            return result
+        record = rows.get(self._make_key(manufacturer, prodname))
+        if record is None:
+            # Backward compatibility for entries that may have been saved with legacy key format
+            record = rows.get(f"{manufacturer.upper().strip()}_{prodname.upper().strip()}")
+        return record
 
-        # Backward compatibility for entries that may have been saved with legacy key format
-        legacy_key = f"{manufacturer.upper().strip()}_{prodname.upper().strip()}"
-        return self.data.get(legacy_key)
+    def all(self) -> list:
+        self._poll()
+        return self._catalog.rows.values()
 
     def set(self, manufacturer: str, prodname: str, result: dict):
         # Only save if we found something useful
@@ -119,18 +770,70 @@ class PumpDictionary:
         }
         
         # Save to memory
-        self.data[key] = entry
+        with self._write_lock:
+            self._discovered.add(key)
+            self._write({key: self._append(entry)})
         # Save to the separate cache file
         self._save_cache(key, entry)
 
-# Singleton instance
-_pump_db = PumpDictionary()
+# Singleton instance, built on first use
+_pump_db = None
+_pump_db_lock = threading.Lock()
+
+def _get_db() -> PumpDictionary:
+    global _pump_db
+    if _pump_db is None:
+        with _pump_db_lock:
+            if _pump_db is None:
+                _pump_db = PumpDictionary()
+    return _pump_db
+
+def start_catalog_watcher(interval: float = CATALOG_WATCH_INTERVAL) -> threading.Event:
+    """Check the catalogue files every `interval` seconds and hot-reload changes. Set the returned event to stop it."""
+    stop = threading.Event()
+
+    def _loop():
+        while not stop.wait(interval):
+            # Nothing to reload until the dictionary is first used; that load reads the current files.
+            if _pump_db is None:
+                continue
+            try:
+                diff = _pump_db.reload_source()
+            except Exception as e:
+                print(f"Catalogue reload failed: {e}")
+                continue
+            if diff:
+                print(f"Reloaded pump catalogue: {diff}")
+
+    threading.Thread(target=_loop, name="catalog-watcher", daemon=True).start()
+    return stop
 
 def get_from_db(manufacturer: str, prodname: str):
-    return _pump_db.get(manufacturer, prodname)
+    return _get_db().get(manufacturer, prodname)
 
 def save_to_db(manufacturer: str, prodname: str, result: dict):
-    _pump_db.set(manufacturer, prodname, result)
+    _get_db().set(manufacturer, prodname, result)
 
 def get_all_pumps():
-    return list(_pump_db.data.values())
\ No newline at end of file
+    return _get_db().all()
+
+def get_pumps_by_manufacturer(manufacturer: str):
+    return _get_db().by_manufacturer(manufacturer)
+
+def get_manufacturer_columns(manufacturer: str) -> dict:
+    return _get_db().columns(manufacturer)
+
+def get_similar_pumps(manufacturer: str, prodname: str, k: int = 5):
+    return _get_db().similar(manufacturer, prodname, k=k)
+
+def get_name_scores(manufacturer: str, prodname: str) -> dict:
+    return _get_db().name_scores(manufacturer, prodname)
+
+def suggest_pumps(prefix: str, manufacturer: str | None = None, limit: int = 10):
+    return _get_db().suggest(prefix, manufacturer=manufacturer, limit=limit)
+
+def find_nearest_pumps(flow, head, phase=None, manufacturer=None, k=10, max_distance=None):
+    return _get_db().nearest_duty(flow, head, phase=phase, manufacturer=manufacturer, k=k, max_distance=max_distance)
+
+def find_pumps_in_range(flow_min, flow_max, head_min, head_max, phase=None, manufacturer=None):
+    return _get_db().in_duty_range(flow_min, flow_max, head_min, head_max, phase=phase, manufacturer=manufacturer)
@@ -0,0 +1,149 @@
+import math
+import sys
+import threading
+from array import array
+from collections.abc import Mapping
+import numpy as np
+
+FIELDS = ("MANUFACTURER", "PRODNAME", "FLOWNOM56", "HEADNOM56", "PHASE", "_source")
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _to_phase(value) -> int:
+    """Phase as 1 or 3, with 0 standing for unknown."""
+    try:
+        phase = int(float(value))
+    except (TypeError, ValueError):
+        return 0
+    return phase if phase in (1, 3) else 0
+
+
+class PumpRecord(Mapping):
+    """Read-only dict-like view of one row in a RecordStore. Use dict(record) for a plain copy."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "RecordStore", row: int):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, field: str):
+        return self._store.value(self._row, field)
+
+    def __iter__(self):
+        return iter(self._store.fields(self._row))
+
+    def __len__(self):
+        return len(self._store.fields(self._row))
+
+    def __repr__(self):
+        return f"PumpRecord({dict(self)!r})"
+
+
+class RecordStore:
+    """
+    Pump records as columns: interned manufacturer and source strings, float32 flow/head
+    (NaN = unknown) and an int8 phase (0 = unknown). Rows are addressed by index and
+    exposed through one PumpRecord view each. Appends may run while other threads read:
+    the lock keeps them from resizing a column that numeric() is reading.
+    """
+
+    def __init__(self):
+        self._manufacturer = []
+        self._prodname = []
+        self._source = []
+        self._flow = array("f")
+        self._head = array("f")
+        self._phase = array("b")
+        self._views = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._views)
+
+    def append(self, record: Mapping) -> int:
+        with self._lock:
+            row = len(self._views)
+            self._manufacturer.append(None)
+            self._prodname.append(None)
+            self._source.append(None)
+            self._flow.append(math.nan)
+            self._head.append(math.nan)
+            self._phase.append(0)
+            self.update(row, record)
+            # The view goes last: len() and view() only ever see complete rows.
+            self._views.append(PumpRecord(self, row))
+            return row
+
+    def extend(self, manufacturers: list, prodnames: list, source: str, flow, head, phase) -> range:
+        """Append many rows at once from column data (e.g. a catalogue snapshot)."""
+        with self._lock:
+            start = len(self._views)
+            stop = start + len(prodnames)
+            self._manufacturer.extend(sys.intern(m) for m in manufacturers)
+            self._prodname.extend(prodnames)
+            self._source.extend([sys.intern(source)] * len(prodnames))
+            self._flow.frombytes(np.asarray(flow, dtype=np.float32).tobytes())
+            self._head.frombytes(np.asarray(head, dtype=np.float32).tobytes())
+            self._phase.frombytes(np.asarray(phase, dtype=np.int8).tobytes())
+            self._views.extend(PumpRecord(self, row) for row in range(start, stop))
+            return range(start, stop)
+
+    def update(self, row: int, record: Mapping):
+        self._manufacturer[row] = sys.intern(str(record.get("MANUFACTURER", "")))
+        self._prodname[row] = str(record.get("PRODNAME", ""))
+        source = record.get("_source")
+        self._source[row] = sys.intern(source) if source else None
+        self._flow[row] = _to_float(record.get("FLOWNOM56"))
+        self._head[row] = _to_float(record.get("HEADNOM56"))
+        self._phase[row] = _to_phase(record.get("PHASE"))
+
+    def view(self, row: int) -> PumpRecord:
+        return self._views[row]
+
+    def fields(self, row: int) -> tuple:
+        return FIELDS if self._source[row] is not None else FIELDS[:-1]
+
+    def value(self, row: int, field: str):
+        if field == "MANUFACTURER":
+            return self._manufacturer[row]
+        if field == "PRODNAME":
+            return self._prodname[row]
+        if field in ("FLOWNOM56", "HEADNOM56"):
+            v = (self._flow if field == "FLOWNOM56" else self._head)[row]
+            # float32 storage: round away the representation error (3.1 -> 3.0999999).
+            return "unknown" if math.isnan(v) else round(v, 4)
+        if field == "PHASE":
+            return self._phase[row] or "unknown"
+        if field == "_source" and self._source[row] is not None:
+            return self._source[row]
+        raise KeyError(field)
+
+    def numeric(self, field: str, rows: np.ndarray) -> np.ndarray:
+        """float64 values of FLOWNOM56/HEADNOM56/PHASE for the given rows, NaN for unknown."""
+        with self._lock:
+            if field == "PHASE":
+                values = np.frombuffer(self._phase, dtype=np.int8)[rows].astype(np.float64)
+                values[values == 0] = np.nan
+                return values
+            column = self._flow if field == "FLOWNOM56" else self._head
+            return np.round(np.frombuffer(column, dtype=np.float32)[rows].astype(np.float64), 4)
+
+
+def numeric_column(records, field: str) -> np.ndarray:
+    """RecordStore.numeric for a sequence of PumpRecord views, which may come from different stores."""
+    values = np.empty(len(records), dtype=np.float64)
+    groups = {}
+    for i, record in enumerate(records):
+        positions, rows = groups.setdefault(record._store, ([], []))
+        positions.append(i)
+        rows.append(record._row)
+    for store, (positions, rows) in groups.items():
+        values[positions] = store.numeric(field, np.asarray(rows, dtype=np.int64))
+    return values
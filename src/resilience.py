@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream that has been failing."""
+
+
+def http_status(error: BaseException) -> int | None:
+    """HTTP status carried by an openai or requests error, if any."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error: BaseException) -> float | None:
+    """Seconds from a Retry-After header on the error's response (numeric form only)."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable_status(status: int | None) -> bool:
+    return status is not None and (status in (408, 429) or status >= 500)
+
+
+class TokenBucket:
+    """
+    `rate` requests per second with bursts of up to `capacity`. Callers reserve a token and
+    sleep until it is theirs, so waiters are served in arrival order and the bucket never
+    runs above the rate. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token; returns how long to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self) -> float:
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and fails fast for `reset_timeout` seconds.
+    Then one probe call is let through: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, name: str, threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def before(self):
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            if self.state == "closed":
+                return
+            now = time.monotonic()
+            remaining = self._opened_at + self.reset_timeout - now
+            # A probe that never reported back (e.g. its task was cancelled) is replaced after a while.
+            stale_probe = self._probe_started is None or now - self._probe_started > self.reset_timeout
+            if remaining <= 0 and stale_probe:
+                self.state = "half_open"
+                self._probe_started = now
+                return
+        raise CircuitOpenError(f"{self.name} circuit open; not retrying for {max(remaining, 0):.0f}s")
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_started = None
+            self.state = "closed"
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_started = None
+            if self.state == "half_open" or (self.state == "closed" and 0 < self.threshold <= self._failures):
+                if self.state == "closed":
+                    print(f"{self.name} failing ({self._failures} errors in a row); failing fast for {self.reset_timeout:.0f}s")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class ApiGuard:
+    """
+    Rate limiting, retries and a circuit breaker around calls to one upstream API.
+
+    `retry_on(error)` decides which errors are transient. Those are retried with full-jitter
+    exponential back-off (or the server's Retry-After, if longer). A call whose retries run
+    out on transient errors other than 429 counts once against the circuit breaker, however
+    many attempts it made; 429 means the upstream is up but busy. `fail_on(error)` marks
+    errors that are not retried but still count against the breaker (e.g. timeouts). A
+    failed half-open probe is not retried, so the circuit re-opens at once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        bucket: TokenBucket,
+        retry_on,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        breaker: CircuitBreaker | None = None,
+        fail_on=None,
+    ):
+        self.name = name
+        self.bucket = bucket
+        self.retry_on = retry_on
+        self.fail_on = fail_on or (lambda error: False)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker(name)
+        self._stats = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0, "throttled_s": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, field: str, amount=1):
+        with self._stats_lock:
+            self._stats[field] += amount
+
+    def _before(self):
+        try:
+            self.breaker.before()
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+        self._count("calls")
+
+    def _backoff(self, attempt: int, error: Exception) -> float | None:
+        """Delay before the next attempt, or None if `error` should be raised."""
+        if not self.retry_on(error):
+            return None
+        if attempt >= self.max_retries or self.breaker.state == "half_open":
+            self._count("failures")
+            return None
+        self._count("retries")
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        return max(delay, min(retry_after(error) or 0.0, self.max_delay))
+
+    def _settle(self, error: Exception | None):
+        if error is not None and (self.retry_on(error) or self.fail_on(error)) and http_status(error) != 429:
+            self.breaker.failure()
+        else:
+            # Success, or an error the upstream answered deliberately (400, 401, ...): it is up.
+            self.breaker.success()
+
+    def call(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            self._before()
+            self._count("throttled_s", self.bucket.acquire())
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._backoff(attempt, e)
+                if delay is None:
+                    self._settle(e)
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._settle(None)
+            return result
+
+    async def acall(self, fn, *args, **kwargs):
+        """call() for coroutine functions."""
+        attempt = 0
+        while True:
+            self._before()
+            self._count("throttled_s", await self.bucket.aacquire())
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._backoff(attempt, e)
+                if delay is None:
+                    self._settle(e)
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._settle(None)
+            return result
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["throttled_s"] = round(stats["throttled_s"], 2)
+        stats["circuit"] = self.breaker.state
+        return stats
+
+
+# One guard per (upstream, API key): everything in the process that uses the same key
+# shares its quota, breaker and counters.
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def guard_for(name: str, api_key: str, factory) -> ApiGuard:
+    """The shared guard for `name` and `api_key`, built by `factory()` on first use."""
+    key = (name, hashlib.sha256((api_key or "").encode()).hexdigest()[:16])
+    with _guards_lock:
+        guard = _guards.get(key)
+        if guard is None:
+            guard = _guards[key] = factory()
+        return guard
+
+
+def resilience_stats() -> dict:
+    """Calls, retries, failures, fast-fail rejections and throttling per guarded upstream."""
+    with _guards_lock:
+        guards = list(_guards.values())
+    return {guard.name: guard.stats() for guard in guards}
@@ -1,4 +1,3 @@
-from serpapi import GoogleSearch
 from src.config import SERPAPI_KEY, MAX_SOURCES_PER_PUMP
 
 
@@ -6,6 +5,8 @@ def google_search(query: str, num_results: int = 5) -> list[dict]:
     if not SERPAPI_KEY:
         raise RuntimeError("SERPAPI_KEY env var must be set")
 
+    from serpapi import GoogleSearch
+
     params = {
         "q": query,
         "api_key": SERPAPI_KEY,
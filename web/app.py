@@ -1,15 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from pathlib import Path
+import asyncio
+import json
+import math
 import re
+import time
 from typing import Any
 
-from src.agent import lookup_pump_hybrid, answer_about_pump
+from src.agent import (
+    alookup_pump_hybrid,
+    alookup_pump_hybrid_swr,
+    aanswer_about_pump,
+    astream_answer_about_pump,
+    match_duty_point,
+)
+from src.config import CATALOG_WATCH_INTERVAL, LOOKUP_STALE_WHILE_REVALIDATE
+from src.pump_dictionary import start_catalog_watcher, suggest_pumps
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Hot-reload the local catalogue when its files change, without restarting workers.
+    stop = start_catalog_watcher() if CATALOG_WATCH_INTERVAL > 0 else None
+    yield
+    if stop is not None:
+        stop.set()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 
 def _clean_prodname(text: str) -> str:
@@ -79,6 +101,9 @@ def is_question(query: str) -> bool:
 
 class LookupRequest(BaseModel):
     query: str
+    # None = LOOKUP_STALE_WHILE_REVALIDATE; stream = push the background refresh as an SSE "update"
+    swr: bool | None = None
+    stream: bool = False
 
 
 class AskRequest(BaseModel):
@@ -86,6 +111,7 @@ class AskRequest(BaseModel):
     prodname: str | None = None
     question: str | None = None
     text: str | None = None
+    stream: bool = False
 
 
 def _fallback_ai_answer(manufacturer: str, prodname: str, question: str) -> str:
@@ -123,9 +149,19 @@ def _fallback_ai_answer(manufacturer: str, prodname: str, question: str) -> str:
     )
 
 
-@app.post("/api/lookup")
-async def api_lookup(payload: LookupRequest):
-    query = (payload.query or "").strip()
+def _lookup_body(manufacturer: str, prodname: str, looks_like_question: bool, hybrid: dict) -> dict:
+    return {
+        "manufacturer": manufacturer,
+        "prodname": prodname,
+        "is_question": looks_like_question,
+        "web_result": hybrid.get("web_result", {}),
+        "local_result": hybrid.get("local_result", {}),
+        "hybrid_comparison": hybrid.get("hybrid_comparison", None),
+        "freshness": hybrid.get("freshness", None),
+    }
+
+
+async def _lookup(query: str, swr: bool | None, stream: bool):
     manufacturer, prodname = parse_natural_query(query)
     looks_like_question = is_question(query)
 
@@ -142,56 +178,70 @@ async def api_lookup(payload: LookupRequest):
             }
         )
 
-    hybrid = lookup_pump_hybrid(manufacturer, prodname, force_web=True)
-    web_result = hybrid.get("web_result", {})
-    local_result = hybrid.get("local_result", {})
-    hybrid_comparison = hybrid.get("hybrid_comparison", None)
-
-    return JSONResponse(
-        {
-            "manufacturer": manufacturer,
-            "prodname": prodname,
-            "is_question": looks_like_question,
-            "web_result": web_result,
-            "local_result": local_result,
-            "hybrid_comparison": hybrid_comparison,
-        }
+    refresh = None
+    if LOOKUP_STALE_WHILE_REVALIDATE if swr is None else swr:
+        hybrid, refresh = await alookup_pump_hybrid_swr(manufacturer, prodname)
+    else:
+        hybrid = await alookup_pump_hybrid(manufacturer, prodname, force_web=True)
+    body = _lookup_body(manufacturer, prodname, looks_like_question, hybrid)
+    if not stream:
+        return JSONResponse(body)
+
+    async def events():
+        yield _sse(body, "result")
+        if refresh is not None:
+            # shield: a client that disconnects must not cancel the refresh other callers share
+            updated = await asyncio.shield(refresh)
+            if updated:
+                yield _sse(_lookup_body(manufacturer, prodname, looks_like_question, updated), "update")
+        yield _sse({}, "done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
-@app.get("/api/lookup")
-async def api_lookup_get(q: str = ""):
-    query = (q or "").strip()
-    manufacturer, prodname = parse_natural_query(query)
-    looks_like_question = is_question(query)
-
-    if not manufacturer:
-        return JSONResponse(
-            {
-                "manufacturer": "",
-                "prodname": prodname,
-                "is_question": looks_like_question,
-                "web_result": {"FLOWNOM56": "unknown", "HEADNOM56": "unknown", "PHASE": "unknown"},
-                "local_result": {"FLOWNOM56": "unknown", "HEADNOM56": "unknown", "PHASE": "unknown"},
-                "hybrid_comparison": None,
-                "error": "Could not detect manufacturer from query.",
-            }
-        )
+@app.post("/api/lookup")
+async def api_lookup(payload: LookupRequest):
+    return await _lookup((payload.query or "").strip(), payload.swr, payload.stream)
 
-    hybrid = lookup_pump_hybrid(manufacturer, prodname, force_web=True)
-    web_result = hybrid.get("web_result", {})
-    local_result = hybrid.get("local_result", {})
-    hybrid_comparison = hybrid.get("hybrid_comparison", None)
 
-    return JSONResponse(
-        {
-            "manufacturer": manufacturer,
-            "prodname": prodname,
-            "is_question": looks_like_question,
-            "web_result": web_result,
-            "local_result": local_result,
-            "hybrid_comparison": hybrid_comparison,
-        }
+@app.get("/api/lookup")
+async def api_lookup_get(q: str = "", swr: bool | None = None, stream: bool = False):
+    return await _lookup((q or "").strip(), swr, stream)
+
+
+def _sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def _stream_answer(manufacturer: str, prodname: str, question: str) -> StreamingResponse:
+    """
+    Server-Sent Events: a "meta" event, one unnamed event per text delta as Perplexity
+    produces it, then "done" with the full answer (same shape as the JSON response).
+    """
+
+    async def events():
+        yield _sse({"manufacturer": manufacturer, "prodname": prodname}, "meta")
+        parts = []
+        if manufacturer and prodname and question and is_question(question):
+            async for chunk in astream_answer_about_pump(manufacturer, prodname, question):
+                parts.append(chunk)
+                yield _sse({"delta": chunk})
+            if not parts:
+                fallback = _fallback_ai_answer(manufacturer, prodname, question)
+                parts.append(fallback)
+                yield _sse({"delta": fallback})
+        yield _sse({"ai_answer": "".join(parts) or None, "manufacturer": manufacturer, "prodname": prodname}, "done")
+
+    # no-cache / no buffering so proxies pass each event straight through
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -206,9 +256,12 @@ async def api_ask(payload: AskRequest):
         manufacturer, prodname = parse_natural_query(text)
         question = question or text
 
+    if payload.stream:
+        return _stream_answer(manufacturer, prodname, question)
+
     ai_answer = None
     if manufacturer and prodname and question and is_question(question):
-        ai_answer = answer_about_pump(manufacturer, prodname, question)
+        ai_answer = await aanswer_about_pump(manufacturer, prodname, question)
         if not ai_answer:
             ai_answer = _fallback_ai_answer(manufacturer, prodname, question)
 
@@ -216,17 +269,87 @@ async def api_ask(payload: AskRequest):
 
 
 @app.get("/api/ask")
-async def api_ask_get(q: str = ""):
+async def api_ask_get(q: str = "", stream: bool = False):
     text = (q or "").strip()
     manufacturer, prodname = parse_natural_query(text)
+    if stream:
+        return _stream_answer(manufacturer, prodname, text)
     ai_answer = None
     if manufacturer and prodname and text and is_question(text):
-        ai_answer = answer_about_pump(manufacturer, prodname, text)
+        ai_answer = await aanswer_about_pump(manufacturer, prodname, text)
         if not ai_answer:
             ai_answer = _fallback_ai_answer(manufacturer, prodname, text)
     return JSONResponse({"ai_answer": ai_answer, "manufacturer": manufacturer, "prodname": prodname})
 
 
+# Upper bound on duty-point matches, whatever the client asks for
+MATCH_MAX_RESULTS = 50
+
+
+@app.get("/api/match")
+async def api_match(
+    flow: float,
+    head: float,
+    phase: str | None = None,
+    manufacturer: str | None = None,
+    k: int = 10,
+    tolerance: float | None = None,
+):
+    """Duty-point search: local pumps that meet (or come closest to) a flow/head, optionally by phase/manufacturer."""
+    # nan and inf pass a plain comparison; reject them here rather than fail in the search.
+    if not (math.isfinite(flow) and math.isfinite(head)) or flow <= 0 or head <= 0:
+        return JSONResponse({"matches": [], "error": "flow and head must be positive numbers."}, status_code=400)
+    if tolerance is not None and not 0 < tolerance < 1:
+        return JSONResponse(
+            {"matches": [], "error": "tolerance must be between 0 and 1 (e.g. 0.2 for +/-20%)."}, status_code=422
+        )
+
+    k = max(1, min(k, MATCH_MAX_RESULTS))
+    start = time.perf_counter()
+    matches = match_duty_point(flow, head, phase=phase, manufacturer=manufacturer, k=k, tolerance=tolerance)
+    elapsed = time.perf_counter() - start
+    return JSONResponse(
+        {
+            "flow": flow,
+            "head": head,
+            "phase": phase,
+            "manufacturer": manufacturer,
+            "matches": matches,
+            "time": f"{elapsed * 1000:.1f}ms",
+        }
+    )
+
+
+# Upper bound on autocomplete results, whatever the client asks for
+SUGGEST_MAX_RESULTS = 25
+
+
+@app.get("/api/suggest")
+async def api_suggest(q: str = "", manufacturer: str | None = None, limit: int = 10):
+    """Autocomplete against the local catalogue: pumps whose product name starts with what was typed."""
+    text = (q or "").strip()
+    limit = max(1, min(limit, SUGGEST_MAX_RESULTS))
+    prefix = text
+    if not manufacturer:
+        manufacturer, prefix = parse_natural_query(text)
+    suggestions = suggest_pumps(prefix, manufacturer=manufacturer or None, limit=limit) if prefix or manufacturer else []
+    if not suggestions and text:
+        # The brand guess may be wrong, or the text may be a brand on its own: try the other reading.
+        if manufacturer:
+            suggestions = suggest_pumps(text, limit=limit)
+        else:
+            suggestions = suggest_pumps("", manufacturer=text, limit=limit)
+    return JSONResponse(
+        {
+            "query": text,
+            "suggestions": [
+                {**dict(record), "label": f"{record['MANUFACTURER']} {record['PRODNAME']}"}
+                for record in suggestions
+            ],
+        }
+    )
+
+
 frontend_dir = Path(__file__).resolve().parent / "frontend"
 main_page = frontend_dir / "main_page.html"
 index_page = frontend_dir / "index.html"
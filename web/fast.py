@@ -4,16 +4,37 @@ import os
 # Add parent directory to path to import src
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from src.agent import lookup_pump_hybrid, answer_about_pump
+from src.agent import (
+    alookup_pump_hybrid,
+    alookup_pump_hybrid_swr,
+    aanswer_about_pump,
+    astream_answer_about_pump,
+    match_duty_point,
+)
+from src.config import CATALOG_WATCH_INTERVAL, LOOKUP_STALE_WHILE_REVALIDATE
+from src.pump_dictionary import start_catalog_watcher, suggest_pumps
+import asyncio
+import json
+import math
 import re
 import time
 from pathlib import Path
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Hot-reload the local catalogue when its files change, without restarting workers.
+    stop = start_catalog_watcher() if CATALOG_WATCH_INTERVAL > 0 else None
+    yield
+    if stop is not None:
+        stop.set()
+
+
+app = FastAPI(lifespan=lifespan)
 
 frontend_dir = Path(__file__).resolve().parent / "frontend"
 app.mount(
@@ -141,32 +162,96 @@ async def ask_pump_question(request: Request):
             status_code=400,
         )
 
+    if data.get("stream"):
+        return _stream_answer(manufacturer, prodname, question, data.get("swr"))
+
     start = time.time()
-    hybrid = lookup_pump_hybrid(manufacturer, prodname, force_web=True)
+    hybrid, _ = await _hybrid(manufacturer, prodname, data.get("swr"))
     elapsed = time.time() - start
 
+    ai_answer = None
+    if question and _is_question(question):
+        ai_answer = await aanswer_about_pump(manufacturer, prodname, question)
+
+    # Return shape compatible with frontend/chats.js
+    return JSONResponse(_ask_payload(manufacturer, prodname, hybrid, elapsed, ai_answer))
+
+
+def _ask_payload(manufacturer: str, prodname: str, hybrid: dict, elapsed: float, ai_answer: str | None) -> dict:
     web_result = hybrid.get("web_result", {}) or {}
     comparison = hybrid.get("hybrid_comparison", {}) or {}
     overall_conf = float(comparison.get("overall_confidence", 0.0))
     overall_label = str(comparison.get("overall_label", "low"))
     confidence_text = f"{overall_label} ({overall_conf * 100:.1f}%)"
 
-    ai_answer = None
-    if question and _is_question(question):
-        ai_answer = answer_about_pump(manufacturer, prodname, question)
+    return {
+        "ai_answer": ai_answer,
+        "manufacturer": manufacturer,
+        "prodname": prodname,
+        "web_result": web_result,
+        "local_result": hybrid.get("local_result", {}) or {},
+        "hybrid_comparison": hybrid.get("hybrid_comparison", None),
+        "freshness": hybrid.get("freshness", None),
+        "time": f"{elapsed:.1f}s",
+        "confidence": confidence_text,
+    }
 
-    # Return shape compatible with frontend/chats.js
-    return JSONResponse(
-        {
-            "ai_answer": ai_answer,
-            "manufacturer": manufacturer,
-            "prodname": prodname,
-            "web_result": web_result,
-            "local_result": hybrid.get("local_result", {}) or {},
-            "hybrid_comparison": hybrid.get("hybrid_comparison", None),
-            "time": f"{elapsed:.1f}s",
-            "confidence": confidence_text,
-        }
+
+async def _hybrid(manufacturer: str, prodname: str, swr=None) -> tuple[dict, asyncio.Task | None]:
+    """Hybrid lookup, stale-while-revalidate unless turned off (per request or LOOKUP_STALE_WHILE_REVALIDATE)."""
+    if LOOKUP_STALE_WHILE_REVALIDATE if swr is None else swr:
+        return await alookup_pump_hybrid_swr(manufacturer, prodname)
+    return await alookup_pump_hybrid(manufacturer, prodname, force_web=True), None
+
+
+def _sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+# Lookups left running by clients that disconnected; the set keeps them from being collected
+_orphaned_lookups = set()
+
+
+def _orphaned_lookup_done(task: asyncio.Task):
+    _orphaned_lookups.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Lookup failed after its client disconnected: {task.exception()}")
+
+
+def _stream_answer(manufacturer: str, prodname: str, question: str, swr=None) -> StreamingResponse:
+    """
+    Server-Sent Events: the answer streams as unnamed {"delta": ...} events while the
+    hybrid lookup runs alongside; "done" carries the usual /api/ask payload.
+    """
+
+    async def events():
+        start = time.time()
+        lookup = asyncio.create_task(_hybrid(manufacturer, prodname, swr))
+        parts = []
+        try:
+            yield _sse({"manufacturer": manufacturer, "prodname": prodname}, "meta")
+            if question and _is_question(question):
+                async for chunk in astream_answer_about_pump(manufacturer, prodname, question):
+                    parts.append(chunk)
+                    yield _sse({"delta": chunk})
+            hybrid, refresh = await lookup
+            if refresh is not None:
+                # The answer took a while anyway; if the refresh landed meanwhile, send that.
+                landed = refresh.done() and not refresh.cancelled()
+                hybrid = (refresh.result() if landed else None) or hybrid
+        finally:
+            if not lookup.done():
+                # Client went away mid-stream: the lookup may be shared with other callers and
+                # its result is cached, so let it finish, referenced and with its outcome observed.
+                _orphaned_lookups.add(lookup)
+                lookup.add_done_callback(_orphaned_lookup_done)
+        yield _sse(_ask_payload(manufacturer, prodname, hybrid, time.time() - start, "".join(parts) or None), "done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -203,14 +288,102 @@ async def api_lookup(request: Request):
             status_code=200,
         )
 
-    hybrid = lookup_pump_hybrid(manufacturer, prodname, force_web=True)
+    hybrid, refresh = await _hybrid(manufacturer, prodname, data.get("swr"))
+    body = _lookup_body(manufacturer, prodname, _is_question(query), hybrid)
+    if not data.get("stream"):
+        return JSONResponse(body)
+
+    async def events():
+        yield _sse(body, "result")
+        if refresh is not None:
+            # shield: a client that disconnects must not cancel the refresh other callers share
+            updated = await asyncio.shield(refresh)
+            if updated:
+                yield _sse(_lookup_body(manufacturer, prodname, body["is_question"], updated), "update")
+        yield _sse({}, "done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _lookup_body(manufacturer: str, prodname: str, looks_like_question: bool, hybrid: dict) -> dict:
+    return {
+        "manufacturer": manufacturer,
+        "prodname": prodname,
+        "is_question": looks_like_question,
+        "web_result": hybrid.get("web_result", {}) or {},
+        "local_result": hybrid.get("local_result", {}) or {},
+        "hybrid_comparison": hybrid.get("hybrid_comparison", None),
+        "freshness": hybrid.get("freshness", None),
+    }
+
+
+# Upper bound on duty-point matches, whatever the client asks for
+MATCH_MAX_RESULTS = 50
+
+
+@app.get("/api/match")
+async def api_match(
+    flow: float,
+    head: float,
+    phase: str | None = None,
+    manufacturer: str | None = None,
+    k: int = 10,
+    tolerance: float | None = None,
+):
+    """Duty-point search: local pumps that meet (or come closest to) a flow/head, optionally by phase/manufacturer."""
+    # nan and inf pass a plain comparison; reject them here rather than fail in the search.
+    if not (math.isfinite(flow) and math.isfinite(head)) or flow <= 0 or head <= 0:
+        return JSONResponse({"matches": [], "error": "flow and head must be positive numbers."}, status_code=400)
+    if tolerance is not None and not 0 < tolerance < 1:
+        return JSONResponse(
+            {"matches": [], "error": "tolerance must be between 0 and 1 (e.g. 0.2 for +/-20%)."}, status_code=422
+        )
+
+    k = max(1, min(k, MATCH_MAX_RESULTS))
+    start = time.perf_counter()
+    matches = match_duty_point(flow, head, phase=phase, manufacturer=manufacturer, k=k, tolerance=tolerance)
+    elapsed = time.perf_counter() - start
     return JSONResponse(
         {
+            "flow": flow,
+            "head": head,
+            "phase": phase,
             "manufacturer": manufacturer,
-            "prodname": prodname,
-            "is_question": _is_question(query),
-            "web_result": hybrid.get("web_result", {}) or {},
-            "local_result": hybrid.get("local_result", {}) or {},
-            "hybrid_comparison": hybrid.get("hybrid_comparison", None),
+            "matches": matches,
+            "time": f"{elapsed * 1000:.1f}ms",
+        }
+    )
+
+
+# Upper bound on autocomplete results, whatever the client asks for
+SUGGEST_MAX_RESULTS = 25
+
+
+@app.get("/api/suggest")
+async def api_suggest(q: str = "", manufacturer: str | None = None, limit: int = 10):
+    """Autocomplete against the local catalogue: pumps whose product name starts with what was typed."""
+    text = (q or "").strip()
+    limit = max(1, min(limit, SUGGEST_MAX_RESULTS))
+    prefix = text
+    if not manufacturer:
+        manufacturer, prefix = _parse_natural_query(text)
+    suggestions = suggest_pumps(prefix, manufacturer=manufacturer or None, limit=limit) if prefix or manufacturer else []
+    if not suggestions and text:
+        # The brand guess may be wrong, or the text may be a brand on its own: try the other reading.
+        if manufacturer:
+            suggestions = suggest_pumps(text, limit=limit)
+        else:
+            suggestions = suggest_pumps("", manufacturer=text, limit=limit)
+    return JSONResponse(
+        {
+            "query": text,
+            "suggestions": [
+                {**dict(record), "label": f"{record['MANUFACTURER']} {record['PRODNAME']}"}
+                for record in suggestions
+            ],
         }
     )
@@ -5,10 +5,14 @@ const HISTORY_KEY = "neuralflow_history";
 const pumpInput = document.getElementById("pumpInput");
 const chatArea = document.getElementById("chatArea");
 const historyList = document.getElementById("historyList");
+const suggestionList = document.getElementById("pumpSuggestions");
 
 let conversations = JSON.parse(localStorage.getItem(HISTORY_KEY)) || [];
 let currentConversation = null;
 let isSearchMode = false;
+let suggestions = [];
+let suggestTimer = null;
+let suggestController = null;
 
 /* ================= UPDATE EMPTY STATE ================= */
 function scrollToBottom() {
@@ -201,7 +205,23 @@ function addBubble(text, type) {
   scrollToBottom();
 }
 
-function addSpecsCard(data, elapsedSec) {
+function freshnessText(freshness) {
+  if (!freshness) return null;
+  const age = freshness.age_s;
+  const ageText = typeof age !== "number" ? null
+    : age < 90 ? `${Math.round(age)}s old`
+    : age < 5400 ? `${Math.round(age / 60)}min old`
+    : age < 129600 ? `${Math.round(age / 3600)}h old`
+    : `${Math.round(age / 86400)}d old`;
+  const parts = [];
+  if (freshness.state === "local") parts.push("catalogue values");
+  else if (age) parts.push(`cached, ${ageText}`);
+  if (freshness.refreshing) parts.push("refreshing…");
+  return parts.length ? parts.join(", ") : null;
+}
+
+// Appends a specs card, or swaps it in for `replaces` (an earlier card for the same lookup).
+function addSpecsCard(data, elapsedSec, replaces = null) {
   const card = document.createElement("div");
   card.className = "spec-card assistant animate-in";
 
@@ -225,12 +245,14 @@ function addSpecsCard(data, elapsedSec) {
   const prodname = data?.prodname || "";
   const title = manufacturer && prodname ? `${manufacturer} ${prodname}` : (prodname || "Pump");
   const timeText = typeof elapsedSec === "number" ? `${elapsedSec.toFixed(1)}s` : null;
+  const fromCatalogue = data?.freshness?.state === "local";
+  const freshText = freshnessText(data?.freshness);
 
   card.innerHTML = `
     <div class="spec-header">
       <div class="spec-title">
-        <span class="spec-icon" aria-hidden="true">🌐</span>
-        Web Search Result
+        <span class="spec-icon" aria-hidden="true">${fromCatalogue ? "📘" : "🌐"}</span>
+        ${fromCatalogue ? "Catalogue Result" : "Web Search Result"}
       </div>
       <div class="spec-code">${prodname || ""}</div>
     </div>
@@ -249,18 +271,73 @@ function addSpecsCard(data, elapsedSec) {
       </div>
     </div>
     <div class="spec-footer">
-      <div class="spec-badge">Web Search</div>
+      <div class="spec-badge">${fromCatalogue ? "Catalogue" : "Web Search"}</div>
       ${timeText ? `<div class="spec-time">| ${timeText}</div>` : ""}
+      ${freshText ? `<div class="spec-time">| ${freshText}</div>` : ""}
     </div>
     ${confLabel && confPct !== null ? `<div class="spec-confidence">Confidence: ${confLabel} (${confPct}%)</div>` : ""}
   `;
 
+  const text = `[Specs] ${title} | Flow=${flow} | Head=${head} | Phase=${phase}`;
+  if (replaces) {
+    replaces.replaceWith(card);
+    card.message = replaces.message;
+    if (card.message) card.message.text = text;
+    saveConversation();
+  } else {
+    chatArea.appendChild(card);
+    scrollToBottom();
+    card.message = { role: "assistant", text };
+    currentConversation?.messages?.push(card.message);
+  }
+  return card;
+}
+
+function addCatalogueCard(entry) {
+  const card = document.createElement("div");
+  card.className = "spec-card assistant animate-in";
+
+  const flow = entry.FLOWNOM56 ?? "unknown";
+  const head = entry.HEADNOM56 ?? "unknown";
+  const phase = entry.PHASE ?? "unknown";
+
+  const flowDisplay = flow === "unknown" ? "N/A" : `${flow} m3/h`;
+  const headDisplay = head === "unknown" ? "N/A" : `${head} m`;
+  const phaseDisplay = phase === "unknown" ? "N/A" : `${phase}-Phase`;
+
+  card.innerHTML = `
+    <div class="spec-header">
+      <div class="spec-title">
+        <span class="spec-icon" aria-hidden="true">📘</span>
+        Local Catalogue
+      </div>
+      <div class="spec-code">${entry.PRODNAME || ""}</div>
+    </div>
+    <div class="spec-grid">
+      <div class="spec-metric">
+        <div class="spec-label">Flow Rate</div>
+        <div class="spec-value">${flowDisplay}</div>
+      </div>
+      <div class="spec-metric">
+        <div class="spec-label">Head</div>
+        <div class="spec-value">${headDisplay}</div>
+      </div>
+      <div class="spec-metric">
+        <div class="spec-label">Electrical Phase</div>
+        <div class="spec-value">${phaseDisplay}</div>
+      </div>
+    </div>
+    <div class="spec-footer">
+      <div class="spec-badge">Catalogue</div>
+    </div>
+  `;
+
   chatArea.appendChild(card);
   scrollToBottom();
 
   currentConversation?.messages?.push({
     role: "assistant",
-    text: `[Specs] ${title} | Flow=${flow} | Head=${head} | Phase=${phase}`,
+    text: `[Catalogue] ${entry.label} | Flow=${flow} | Head=${head} | Phase=${phase}`,
   });
 }
 
@@ -279,6 +356,104 @@ function removeElement(id) {
   if (el) el.remove();
 }
 
+/* ================= STREAMING ================= */
+
+// Reads a text/event-stream body, calling onEvent(name, data) for each event
+// (unnamed events are "message").
+async function readEventStream(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = "message";
+      const lines = [];
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) lines.push(line.slice(5).trimStart());
+      }
+      if (lines.length) onEvent(event, JSON.parse(lines.join("\n")));
+    }
+  }
+}
+
+// Calls onDelta for each answer chunk; resolves with the data of the final "done" event.
+async function readAnswerStream(res, onDelta) {
+  let done = null;
+  await readEventStream(res, (event, payload) => {
+    if (event === "done") done = payload;
+    else if (event === "message" && payload.delta) onDelta(payload.delta);
+  });
+  return done;
+}
+
+// Resolves with the first "result" of a streamed lookup. A later "update" (the background
+// web refresh of a stale or catalogue-only result) is passed to onUpdate.
+function readLookupStream(res, onUpdate) {
+  return new Promise((resolve, reject) => {
+    let first = null;
+    readEventStream(res, (event, payload) => {
+      if (event === "result" && !first) {
+        first = payload;
+        resolve(payload);
+      } else if (event === "update") {
+        onUpdate(payload);
+      }
+    })
+      .then(() => { if (!first) reject(new Error("lookup stream ended without a result")); })
+      .catch(err => { if (!first) reject(err); });
+  });
+}
+
+/* ================= SUGGESTIONS ================= */
+
+function normalizeName(text) {
+  return text.toUpperCase().replace(/[^A-Z0-9]/g, "");
+}
+
+function clearSuggestions() {
+  suggestions = [];
+  suggestionList.innerHTML = "";
+}
+
+async function fetchSuggestions(text) {
+  // Only the latest keystroke matters: cancel any request still in flight.
+  suggestController?.abort();
+  suggestController = new AbortController();
+
+  try {
+    const res = await fetch(`/api/suggest?q=${encodeURIComponent(text)}&limit=8`, {
+      signal: suggestController.signal,
+    });
+    if (!res.ok) return;
+
+    const data = await res.json();
+    suggestions = data.suggestions || [];
+    suggestionList.innerHTML = "";
+    suggestions.forEach(s => {
+      const option = document.createElement("option");
+      option.value = s.label;
+      suggestionList.appendChild(option);
+    });
+  } catch {
+    // Aborted or offline: keep the previous suggestions.
+  }
+}
+
+function exactCatalogueMatch(input) {
+  const target = normalizeName(input);
+  return suggestions.find(s => normalizeName(s.label) === target) || null;
+}
+
 /* ================= API CALLS ================= */
 
 async function runSearch() {
@@ -300,7 +475,12 @@ async function runSearch() {
     text: input
   });
 
+  // An exact catalogue entry can be shown right away, before the slower web lookup returns.
+  const catalogueMatch = exactCatalogueMatch(input);
+  if (catalogueMatch) addCatalogueCard(catalogueMatch);
+
   pumpInput.value = "";
+  clearSuggestions();
 
   /* ---- STEP 1: Lookup ---- */
   const loadingSpecs = addLoadingBubble("loadingSpecs", "Searching for pump specifications");
@@ -312,15 +492,32 @@ async function runSearch() {
     const res = await fetch("/api/lookup", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ query: input }),
+      body: JSON.stringify({ query: input, stream: true }),
     });
 
     if (!res.ok) throw new Error();
 
-    data = await res.json();
+    let card = null;
+    // An update can arrive in the same chunk as the result, before its card exists: keep it for then.
+    let pendingUpdate = null;
+    const contentType = res.headers.get("Content-Type") || "";
+    if (contentType.includes("text/event-stream") && res.body) {
+      // Known pumps answer at once from cache; a background web refresh may follow.
+      data = await readLookupStream(res, update => {
+        const updateSec = (performance.now() - lookupStart) / 1000;
+        if (card) card = addSpecsCard(update, updateSec, card);
+        else pendingUpdate = { update, updateSec };
+      });
+    } else {
+      data = await res.json();
+    }
     removeElement("loadingSpecs");
     const elapsedSec = (performance.now() - lookupStart) / 1000;
-    addSpecsCard(data, elapsedSec);
+    card = addSpecsCard(data, elapsedSec);
+    if (pendingUpdate) {
+      card = addSpecsCard(pendingUpdate.update, pendingUpdate.updateSec, card);
+      pendingUpdate = null;
+    }
     if (data?.manufacturer && data?.prodname) {
       currentConversation.title = `${data.manufacturer} ${data.prodname}`;
     }
@@ -361,22 +558,50 @@ async function runSearch() {
         manufacturer: data.manufacturer,
         prodname: data.prodname,
         question: input,
+        stream: true,
       }),
     });
 
-    removeElement("loadingAI");
-
-    const aiData = await res.json();
+    if (!res.ok) throw new Error();
 
-    if (aiData.ai_answer) {
-      const bubble = document.createElement("div");
-      bubble.className = "chat-bubble assistant";
-      chatArea.appendChild(bubble);
-      typeText(bubble, aiData.ai_answer, 15);
+    let answer = null;
+    const contentType = res.headers.get("Content-Type") || "";
+
+    if (contentType.includes("text/event-stream") && res.body) {
+      // Render the answer as it arrives instead of waiting for the full completion.
+      let bubble = null;
+      let streamed = "";
+      const aiData = await readAnswerStream(res, delta => {
+        if (!bubble) {
+          removeElement("loadingAI");
+          bubble = document.createElement("div");
+          bubble.className = "chat-bubble assistant";
+          chatArea.appendChild(bubble);
+        }
+        streamed += delta;
+        bubble.textContent = streamed;
+        scrollToBottom();
+      });
+      removeElement("loadingAI");
+      answer = aiData?.ai_answer || streamed || null;
+      if (bubble && answer) bubble.textContent = answer;
+      else if (answer) addBubble(answer, "assistant");
+    } else {
+      removeElement("loadingAI");
+      const aiData = await res.json();
+      answer = aiData.ai_answer;
+      if (answer) {
+        const bubble = document.createElement("div");
+        bubble.className = "chat-bubble assistant";
+        chatArea.appendChild(bubble);
+        typeText(bubble, answer, 15);
+      }
+    }
 
+    if (answer) {
       currentConversation.messages.push({
         role: "assistant",
-        text: aiData.ai_answer
+        text: answer
       });
     } else {
       addBubble("Could not generate explanation.", "assistant");
@@ -431,6 +656,18 @@ pumpInput.addEventListener("keydown", e => {
 
 });
 
+pumpInput.addEventListener("input", () => {
+  clearTimeout(suggestTimer);
+  const text = pumpInput.value.trim();
+
+  if (isSearchMode || text.length < 2) {
+    clearSuggestions();
+    return;
+  }
+
+  suggestTimer = setTimeout(() => fetchSuggestions(text), 150);
+});
+
 window.addEventListener("resize", () => {
   scrollToBottom();
 });